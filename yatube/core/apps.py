@@ -3,3 +3,18 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from django.template.loader import get_template
+
+        from .db import apply_sqlite_pragmas, check_connections
+
+        connection_created.connect(apply_sqlite_pragmas)
+        request_started.connect(check_connections)
+        # С cached.Loader шаблоны компилируются один раз, здесь —
+        # до первого запроса.
+        for template_name in settings.TEMPLATES_PRELOAD:
+            get_template(template_name)
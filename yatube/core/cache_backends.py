@@ -0,0 +1,70 @@
+"""Бэкенды кеша, которые сообщают попадания и промахи в метрики.
+
+FileBasedCache годится как общий кеш воркеров одного сервера,
+RedisCache доступен, если установлен django-redis.
+"""
+import os
+import tempfile
+import threading
+
+from django.core.cache.backends import filebased, locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+try:
+    from django_redis.cache import RedisCache as BaseRedisCache
+except ImportError:
+    BaseRedisCache = None
+
+from . import metrics
+
+_local = threading.local()
+_MISSING = object()
+
+
+class MetricsCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if not getattr(_local, 'in_get_many', False):
+            metrics.record_cache(*((1, 0) if value is not _MISSING
+                                   else (0, 1)))
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        _local.in_get_many = True
+        try:
+            values = super().get_many(keys, version)
+        finally:
+            _local.in_get_many = False
+        metrics.record_cache(len(values), len(keys) - len(values))
+        return values
+
+
+class LocMemCache(MetricsCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(MetricsCacheMixin, filebased.FileBasedCache):
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Атомарный add: файл появляется через os.link, который
+        не перезаписывает существующий, поэтому add годится
+        для блокировок между процессами."""
+        if self.has_key(key, version):
+            return False
+        self._createdir()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as file:
+                self._write_content(file, timeout, value)
+            try:
+                os.link(tmp_path, self._key_to_file(key, version))
+            except FileExistsError:
+                return False
+            return True
+        finally:
+            os.remove(tmp_path)
+
+
+if BaseRedisCache is not None:
+    class RedisCache(MetricsCacheMixin, BaseRedisCache):
+        pass
@@ -0,0 +1,66 @@
+"""Получение значения из кеша с защитой от «давки» (cache stampede).
+
+get_or_compute хранит рядом со значением время его вычисления и срок
+годности. Незадолго до истечения срока один из процессов с вероятностью,
+растущей по мере приближения к сроку, пересчитывает значение заранее
+(алгоритм XFetch). Пересчёт идёт под блокировкой cache.add, остальные
+процессы в это время отдают старое значение, а если значения ещё нет —
+недолго ждут, пока его положит владелец блокировки.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache
+
+LOCK_TIMEOUT: int = 30
+LOCK_WAIT: float = 5.0
+POLL_INTERVAL: float = 0.05
+# Сколько секунд значение хранится после срока годности, чтобы его
+# можно было отдавать, пока идёт пересчёт.
+STALE_TIMEOUT: int = 60
+BETA: float = 1.0
+
+
+def _recompute_early(delta, expiry, beta):
+    return time.time() - delta * beta * math.log(random.random()) >= expiry
+
+
+def _store(cache, key, value, delta, timeout):
+    if timeout is None:
+        cache.set(key, (value, delta, math.inf), None)
+    else:
+        cache.set(key, (value, delta, time.time() + timeout),
+                  timeout + STALE_TIMEOUT)
+
+
+def get_or_compute(key, compute, timeout, cache=None, beta=BETA):
+    """Значение из кеша или результат compute().
+
+    None, который вернул compute(), не кешируется."""
+    cache = cache or default_cache
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        if not _recompute_early(delta, expiry, beta):
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return value
+    elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # Владелец блокировки не успел, считаем сами.
+        return compute()
+    try:
+        started = time.monotonic()
+        value = compute()
+        if value is not None:
+            _store(cache, key, value, time.monotonic() - started, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
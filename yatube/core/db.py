@@ -0,0 +1,136 @@
+"""Настройка соединений с базой данных.
+
+apply_sqlite_pragmas выставляет PRAGMA из SQLITE_PRAGMAS каждому новому
+соединению SQLite: WAL не даёт писателю блокировать читателей.
+check_connections перед запросом проверяет постоянные соединения
+(CONN_MAX_AGE) не чаще раза в DB_HEALTH_CHECK_INTERVAL секунд и
+закрывает оборвавшиеся. ConnectionPool — пул соединений для бэкенда
+core.db_backends.postgresql_pool.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connections
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Обработчик сигнала connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Обработчик сигнала request_started."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        checked = getattr(connection, 'health_checked_at', None)
+        if (checked is not None
+                and now - checked < settings.DB_HEALTH_CHECK_INTERVAL):
+            continue
+        if connection.is_usable():
+            connection.health_checked_at = now
+        else:
+            connection.close()
+            connection.health_checked_at = None
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений.
+
+    connect() открывает новое соединение, is_usable(connection)
+    проверяет простаивавшее больше check_interval секунд соединение
+    перед выдачей, close(connection) закрывает его. Соединения старше
+    max_lifetime секунд закрываются при возврате в пул.
+    """
+
+    def __init__(self, connect, is_usable, close, max_size=10,
+                 timeout=5.0, max_lifetime=1800.0, check_interval=30.0):
+        self.connect = connect
+        self.is_usable = is_usable
+        self.close = close
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self._idle = deque()
+        self._created = {}
+        self._opening = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        return len(self._created) + self._opening
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection, released = self._idle.pop()
+                    if (time.monotonic() - released < self.check_interval
+                            or self.is_usable(connection)):
+                        return connection
+                    self._discard(connection)
+                if self.size < self.max_size:
+                    # Место занимается до подключения, чтобы
+                    # не превысить max_size из соседних потоков.
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'Нет свободных соединений за {self.timeout} с')
+                self._condition.wait(remaining)
+        connection = None
+        try:
+            connection = self.connect()
+        finally:
+            with self._condition:
+                self._opening -= 1
+                if connection is None:
+                    self._condition.notify()
+                else:
+                    self._created[id(connection)] = time.monotonic()
+        return connection
+
+    def release(self, connection):
+        with self._condition:
+            created = self._created.get(id(connection))
+            if created is None:
+                return
+            if time.monotonic() - created > self.max_lifetime:
+                self._discard(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Закрывает сломанное соединение вместо возврата в пул."""
+        with self._condition:
+            if id(connection) in self._created:
+                self._discard(connection)
+                self._condition.notify()
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        try:
+            self.close(connection)
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._condition:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._discard(connection)
@@ -0,0 +1,73 @@
+"""PostgreSQL с пулом соединений.
+
+Подключается как ENGINE 'core.db_backends.postgresql_pool'. Закрытие
+соединения Django возвращает его в пул, поэтому CONN_MAX_AGE = 0 не
+означает нового подключения на каждый запрос. Параметры пула задаются
+ключом POOL в настройках базы: MAX_SIZE, TIMEOUT, MAX_LIFETIME,
+CHECK_INTERVAL.
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+def _close(connection):
+    connection.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                options = self.settings_dict.get('POOL', {})
+                pool = _pools[self.alias] = ConnectionPool(
+                    lambda: base.Database.connect(**conn_params),
+                    _is_usable,
+                    _close,
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5.0),
+                    max_lifetime=options.get('MAX_LIFETIME', 1800.0),
+                    check_interval=options.get('CHECK_INTERVAL', 30.0),
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).acquire()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', extensions.ISOLATION_LEVEL_READ_COMMITTED)
+        if connection.isolation_level != self.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        pool = _pools.get(self.alias)
+        if pool is None:
+            return super()._close()
+        connection = self.connection
+        if connection.closed:
+            pool.discard(connection)
+            return
+        try:
+            status = connection.get_transaction_status()
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except base.Database.Error:
+            pool.discard(connection)
+        else:
+            pool.release(connection)
@@ -0,0 +1,182 @@
+"""Метрики запросов: время ответа, SQL, рендер шаблонов и кеш.
+
+Middleware RequestMetricsMiddleware открывает замер для доли запросов
+METRICS_SAMPLE_RATE. Пока замер открыт, SQL считается через
+execute_wrapper, время рендера — бэкендом шаблонов
+core.template_backends.DjangoTemplates, время рендера каждого шаблона
+с учётом вложенных — загрузчиком core.template_loaders.ProfilingLoader,
+попадания в кеш — бэкендами
+из core.cache_backends. Итог пишется в лог yatube.metrics и
+накапливается для страницы /metrics/.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('yatube.metrics')
+
+RESERVOIR_SIZE: int = 1000
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.templates = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self, view, status, wall_time):
+        return {
+            'view': view,
+            'status': status,
+            'wall_ms': round(wall_time * 1000, 3),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'template_ms': round(self.template_time * 1000, 3),
+            'templates': {
+                name: {'count': count, 'ms': round(duration * 1000, 3)}
+                for name, (count, duration) in self.templates.items()
+            },
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def record_template(duration):
+    metrics = current()
+    if metrics is not None:
+        metrics.template_time += duration
+
+
+def record_template_render(name, duration):
+    metrics = current()
+    if metrics is not None:
+        count, total = metrics.templates.get(name, (0, 0.0))
+        metrics.templates[name] = (count + 1, total + duration)
+
+
+def record_cache(hits, misses=0):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    metrics = current()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.sql_count += 1
+            metrics.sql_time += time.perf_counter() - start
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1,
+                      round(percent / 100 * (len(values) - 1)))]
+
+
+def aggregate(record):
+    with _lock:
+        stats = _stats.setdefault(record['view'], {
+            'requests': 0,
+            'wall_ms': 0.0,
+            'sql_count': 0,
+            'sql_ms': 0.0,
+            'template_ms': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'templates': {},
+            'reservoir': deque(maxlen=RESERVOIR_SIZE),
+        })
+        stats['requests'] += 1
+        for field in ('wall_ms', 'sql_count', 'sql_ms', 'template_ms',
+                      'cache_hits', 'cache_misses'):
+            stats[field] += record[field]
+        for name, template in record['templates'].items():
+            stats['templates'][name] = (stats['templates'].get(name, 0.0)
+                                        + template['ms'])
+        stats['reservoir'].append(record['wall_ms'])
+
+
+def snapshot():
+    """Накопленные метрики по представлениям."""
+    result = {}
+    with _lock:
+        for view, stats in _stats.items():
+            requests = stats['requests']
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            result[view] = {
+                'requests': requests,
+                'wall_ms_avg': round(stats['wall_ms'] / requests, 3),
+                'wall_ms_p50': _percentile(stats['reservoir'], 50),
+                'wall_ms_p95': _percentile(stats['reservoir'], 95),
+                'sql_count_avg': round(stats['sql_count'] / requests, 3),
+                'sql_ms_avg': round(stats['sql_ms'] / requests, 3),
+                'template_ms_avg': round(stats['template_ms'] / requests,
+                                         3),
+                'templates_ms_avg': {
+                    name: round(total / requests, 3)
+                    for name, total in sorted(stats['templates'].items(),
+                                              key=lambda item: -item[1])
+                },
+                'cache_hit_ratio': (round(stats['cache_hits'] / lookups, 3)
+                                    if lookups else None),
+            }
+    return result
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+class RequestMetricsMiddleware:
+    """Замеряет долю запросов METRICS_SAMPLE_RATE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (current() is not None
+                or random.random() >= settings.METRICS_SAMPLE_RATE):
+            return self.get_response(request)
+        _local.metrics = metrics = RequestMetrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        if view != 'metrics':
+            record = metrics.as_dict(view,
+                                     response.status_code,
+                                     time.perf_counter() - metrics.started)
+            logger.info(json.dumps(record))
+            aggregate(record)
+        return response
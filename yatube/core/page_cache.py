@@ -0,0 +1,119 @@
+"""Кеш целых страниц с «дырками» для пользовательских фрагментов.
+
+Страница рендерится один раз как скелет: вместо фрагментов, зависящих
+от пользователя (шапка, переключатель лент, форма комментария
+с CSRF-токеном), тег {% hole %} оставляет метку. Скелет кешируется
+через get_or_compute, а при каждом запросе метки заполняются рендером
+маленьких шаблонов, как в edge-side includes. Гости получают готовую
+страницу целиком.
+"""
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from .caching import get_or_compute
+
+PAGE_CACHE_TIMEOUT: int = 60 * 60
+PAGE_CACHE_PREFIX: str = 'page-skeleton'
+# Остальные параметры запроса на страницу не влияют и в ключ не входят,
+# иначе ими можно было бы заполнить кеш копиями одной страницы.
+PAGE_CACHE_PARAMS: tuple = ('cursor', 'page')
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+
+def hole_marker(template_name, args):
+    payload = json.dumps([template_name, args], separators=(',', ':'))
+    return '<!--hole:{}-->'.format(
+        base64.urlsafe_b64encode(payload.encode()).decode())
+
+
+def render_hole(request, template_name, args):
+    return render_to_string(template_name, args, request=request)
+
+
+def fill_holes(request, skeleton):
+    """Заполняет метки скелета фрагментами для текущего пользователя."""
+    def replace(match):
+        template_name, args = json.loads(
+            base64.urlsafe_b64decode(match.group(1)).decode())
+        return render_hole(request, template_name, args)
+    return HOLE_RE.sub(replace, skeleton)
+
+
+def is_skeleton_render(request):
+    return getattr(request, 'render_skeleton', False)
+
+
+def _key(request, version, suffix):
+    params = urlencode([(name, request.GET[name])
+                        for name in PAGE_CACHE_PARAMS if name in request.GET])
+    path = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return f'{PAGE_CACHE_PREFIX}:{path}:{version}:{suffix}'
+
+
+def _response(content, content_type):
+    return HttpResponse(content, content_type=content_type)
+
+
+def skeleton_cache(version, timeout=PAGE_CACHE_TIMEOUT):
+    """Кеширует страницу как скелет с дырками.
+
+    version(request, *args, **kwargs) возвращает версию данных страницы
+    или None, если страницу кешировать нельзя."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            current = version(request, *args, **kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+            anonymous = not request.user.is_authenticated
+            if anonymous:
+                page = cache.get(_key(request, current, 'anonymous'))
+                if page is not None:
+                    response = _response(*page)
+                    patch_vary_headers(response, ('Cookie',))
+                    return response
+            rendered = {}
+
+            def render_skeleton():
+                request.render_skeleton = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request.render_skeleton = False
+                rendered['response'] = response
+                if response.streaming or response.status_code != 200:
+                    return None
+                return (response.content.decode(response.charset),
+                        response['Content-Type'])
+
+            skeleton = get_or_compute(_key(request, current, 'skeleton'),
+                                      render_skeleton, timeout)
+            response = rendered.get('response')
+            if skeleton is None:
+                if not response.streaming:
+                    response.content = fill_holes(
+                        request, response.content.decode(response.charset))
+                return response
+            content, content_type = skeleton
+            if response is None:
+                response = _response('', content_type)
+            response.content = fill_holes(request, content)
+            if anonymous:
+                cache.set(_key(request, current, 'anonymous'),
+                          (response.content, response['Content-Type']),
+                          timeout)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,70 @@
+"""Чтение с реплик базы данных.
+
+ReplicaMiddleware помечает запросы к представлениям из REPLICA_VIEWS
+как только читающие, и ReplicaRouter отправляет чтение моделей
+приложений из REPLICA_APPS на одну из реплик DATABASE_REPLICAS.
+Запись всегда идёт в default. После представлений из
+PRIMARY_AFTER_VIEWS ставится cookie, и ещё READ_YOUR_WRITES_SECONDS
+секунд все запросы пользователя читают из default, чтобы он сразу
+видел свой пост, комментарий или подписку, даже если реплика отстаёт.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE: str = 'read_primary'
+
+_local = threading.local()
+
+
+def use_replica():
+    return getattr(_local, 'use_replica', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS and use_replica()
+                and model._meta.app_label in settings.REPLICA_APPS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.use_replica = False
+        match = getattr(request, 'resolver_match', None)
+        # Пишущие представления после записи делают редирект.
+        if (match is not None and response.status_code == 302
+                and match.view_name in settings.PRIMARY_AFTER_VIEWS):
+            response.set_cookie(PRIMARY_COOKIE, '1',
+                                max_age=settings.READ_YOUR_WRITES_SECONDS,
+                                httponly=True,
+                                samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.use_replica = (
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and PRIMARY_COOKIE not in request.COOKIES
+        )
@@ -0,0 +1,28 @@
+import time
+
+from django.template.backends import django
+
+from . import metrics
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.record_template(time.perf_counter() - start)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """Стандартный бэкенд шаблонов, который сообщает время рендера
+    в метрики запроса."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except django.TemplateDoesNotExist as exc:
+            django.reraise(exc, self)
@@ -0,0 +1,67 @@
+"""Загрузчик шаблонов, который замеряет время рендера каждого шаблона.
+
+ProfilingLoader оборачивает переданные ему загрузчики, как это делает
+django.template.loaders.cached.Loader, и возвращает шаблоны, которые
+сообщают в метрики запроса время своего рендера вместе со всеми
+вложенными {% include %}. Пока замер запроса не открыт, обёртка
+ничего не считает.
+
+Шаблоны загружают сами вложенные загрузчики, поэтому cached.Loader
+ставится внутрь ProfilingLoader (см. settings_prod): снаружи он
+вызывал бы base.Loader.get_template на себе и кешировал шаблоны
+без обёртки.
+"""
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.loaders import base
+
+from . import metrics
+
+
+class ProfiledTemplate:
+    # Атрибут не называется template: IncludeNode принимает объект
+    # с таким атрибутом за шаблон бэкенда и разворачивает его.
+    def __init__(self, template):
+        self.wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def render(self, context):
+        if metrics.current() is None:
+            return self.wrapped.render(context)
+        start = time.perf_counter()
+        try:
+            return self.wrapped.render(context)
+        finally:
+            metrics.record_template_render(self.wrapped.origin.template_name,
+                                           time.perf_counter() - start)
+
+
+class ProfilingLoader(base.Loader):
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_contents(self, origin):
+        return origin.loader.get_contents(origin)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            yield from loader.get_template_sources(template_name)
+
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for loader in self.loaders:
+            try:
+                template = loader.get_template(template_name, skip)
+            except TemplateDoesNotExist as error:
+                tried.extend(error.tried)
+            else:
+                return ProfiledTemplate(template)
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+    def reset(self):
+        for loader in self.loaders:
+            loader.reset()
@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..page_cache import hole_marker, is_skeleton_render, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **args):
+    """Фрагмент, зависящий от пользователя. Рендерится только
+    из аргументов и контекст-процессоров, а в скелете страницы
+    заменяется меткой."""
+    request = context.get('request')
+    if request is not None and is_skeleton_render(request):
+        return mark_safe(hole_marker(template_name, args))
+    return render_hole(request, template_name, args)
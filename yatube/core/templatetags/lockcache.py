@@ -0,0 +1,51 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from ..caching import get_or_compute
+
+register = template.Library()
+
+
+class LockCacheNode(CacheNode):
+    """{% cache %}, который пересчитывает фрагмент под блокировкой
+    и заранее, через get_or_compute."""
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"lockcache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}')
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"lockcache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}')
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = 'lock' + make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_compute(key,
+                              lambda: self.nodelist.render(context),
+                              expire_time)
+
+
+@register.tag('lockcache')
+def do_lockcache(parser, token):
+    """Как {% cache [expire_time] [fragment_name] [var1] ... %},
+    но с защитой от одновременного пересчёта."""
+    nodelist = parser.parse(('endlockcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.')
+    return LockCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+        None,
+    )
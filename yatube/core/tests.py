@@ -1,6 +1,27 @@
+import importlib
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse, set_script_prefix
+
+from posts.models import Post
+
+from . import caching, db, metrics, routers
+from .urlresolvers import fast_reverse
+from .cache_backends import FileBasedCache
+
+User = get_user_model()
 
 
 class CorePageTests(TestCase):
@@ -14,3 +35,332 @@ class CorePageTests(TestCase):
         self.assertTemplateUsed(response,
                                 'core/404.html',
                                 msg_prefix='Используется неверный шаблон')
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+        Post.objects.create(text='Тестовый пост', author=cls.test_user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0)
+    def test_request_metrics_recorded(self):
+        """Проверяем, что для замеренного запроса собираются
+        SQL, время рендера и обращения к кешу."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        stats = metrics.snapshot()['posts:index']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['sql_count_avg'], 0)
+        self.assertGreater(stats['template_ms_avg'], 0)
+        self.assertIsNotNone(stats['cache_hit_ratio'])
+        self.assertGreater(stats['cache_hit_ratio'], 0,
+                           'Попадания в кеш не учтены')
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0)
+    def test_template_profiling(self):
+        """Проверяем, что время рендера считается по каждому шаблону,
+        включая карточки постов из {% include %}."""
+        self.client.get(reverse('posts:index'))
+        templates = metrics.snapshot()['posts:index']['templates_ms_avg']
+        for template_name in ('posts/index.html',
+                              'posts/includes/post_card.html'):
+            with self.subTest(template_name=template_name):
+                self.assertIn(template_name, templates,
+                              'Шаблон не попал в профиль')
+
+    def test_template_profiling_with_prod_loaders(self):
+        """Проверяем, что с загрузчиками из settings_prod шаблоны
+        и профилируются, и берутся из cached.Loader."""
+        with mock.patch.dict(os.environ, SECRET_KEY='test'):
+            settings_prod = importlib.import_module('yatube.settings_prod')
+        with override_settings(METRICS_SAMPLE_RATE=1.0,
+                               TEMPLATES=settings_prod.TEMPLATES):
+            self.client.get(reverse('posts:index'))
+            templates = metrics.snapshot()['posts:index']['templates_ms_avg']
+            self.assertIn('posts/index.html', templates,
+                          'Шаблон не попал в профиль')
+            first = get_template('posts/index.html').template
+            second = get_template('posts/index.html').template
+            self.assertIs(first.wrapped, second.wrapped,
+                          'Шаблон не закеширован')
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_request_metrics_sampling(self):
+        """Проверяем, что при нулевой доле замеров метрики
+        не собираются."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(metrics.snapshot(), {})
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        """Проверяем, что страница метрик доступна только
+        сотрудникам и по токену, но не по адресу клиента."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('posts:index', response.json())
+        self.assertNotIn('metrics', response.json())
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        self.assertEqual(staff_client.get(reverse('metrics')).status_code,
+                         HTTPStatus.OK)
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                self.assertEqual(
+                    self.client.get(reverse('metrics'),
+                                    **headers).status_code,
+                    HTTPStatus.NOT_FOUND)
+
+
+class FastReverseTests(TestCase):
+    def test_matches_reverse(self):
+        """Проверяем, что fast_reverse строит те же адреса,
+        что и reverse, включая экранирование и префикс скрипта."""
+        cases = (
+            ('posts:post_detail', [12]),
+            ('posts:profile', ['Иван.ivan@mail+1']),
+            ('posts:group_list', ['test-slug']),
+            ('posts:index', []),
+        )
+        self.addCleanup(set_script_prefix, '/')
+        for prefix in ('/', '/yatube/'):
+            set_script_prefix(prefix)
+            for viewname, args in cases:
+                with self.subTest(prefix=prefix, viewname=viewname):
+                    self.assertEqual(fast_reverse(viewname, *args),
+                                     reverse(viewname, args=args))
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.test_user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.test_user)
+
+    def test_anonymous_page_cached(self):
+        """Проверяем, что гость получает главную страницу из кеша
+        без запросов к базе."""
+        response = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content, cached.content)
+        self.assertIn('Cookie', cached['Vary'])
+
+    def test_holes_filled_for_user(self):
+        """Проверяем, что в скелет из кеша подставляются фрагменты
+        текущего пользователя."""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(2):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пользователь: test_user')
+        self.assertContains(response, 'Избранные авторы')
+        self.assertNotContains(response, '<!--hole:')
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, 'Редактировать запись')
+
+    def test_unknown_params_share_cache(self):
+        """Проверяем, что посторонние параметры запроса не создают
+        новых записей кеша, а cursor и page учитываются."""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:index'), {'utm_source': 'x'})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:index'), {'page': 2})
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_computed_once_under_concurrency(self):
+        """Проверяем, что одновременные промахи пересчитывают
+        значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'значение'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                caching.get_or_compute('key', compute, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1, 'Значение пересчитано несколько раз')
+        self.assertEqual(results, ['значение'] * 5)
+
+    def test_stale_value_while_locked(self):
+        """Проверяем, что во время пересчёта другие получают старое
+        значение, а после срока годности значение пересчитывается."""
+        caching.get_or_compute('key', lambda: 'старое', 60)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            cache.add('key:lock', 1)
+            self.assertEqual(
+                caching.get_or_compute('key', lambda: 'новое', 60),
+                'старое')
+            cache.delete('key:lock')
+            self.assertEqual(
+                caching.get_or_compute('key', lambda: 'новое', 60),
+                'новое')
+
+    def test_none_not_cached(self):
+        """Проверяем, что None не кешируется."""
+        self.assertIsNone(caching.get_or_compute('key', lambda: None, 60))
+        self.assertIsNone(cache.get('key'))
+
+
+class FileBasedCacheTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = FileBasedCache(self.location, {})
+
+    def test_add_is_exclusive(self):
+        """Проверяем, что add не перезаписывает существующий ключ
+        и срабатывает после его истечения."""
+        self.assertTrue(self.cache.add('lock', 1, 60))
+        self.assertFalse(self.cache.add('lock', 2, 60))
+        self.assertEqual(self.cache.get('lock'), 1)
+        self.cache.set('expired', 1, -1)
+        self.assertTrue(self.cache.add('expired', 2, 60))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.usable = True
+        self.closed = False
+
+
+class DatabaseConnectionTests(TestCase):
+    def make_pool(self, **kwargs):
+        created = []
+
+        def connect():
+            created.append(FakeConnection())
+            return created[-1]
+
+        def close(conn):
+            conn.closed = True
+
+        pool = db.ConnectionPool(connect, lambda conn: conn.usable, close,
+                                 **kwargs)
+        return pool, created
+
+    def test_sqlite_pragmas(self):
+        """Проверяем, что новому соединению SQLite выставлены PRAGMA."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1, 'synchronous не NORMAL')
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+
+    def test_pool_reuses_connections(self):
+        """Проверяем, что пул отдаёт возвращённое соединение повторно
+        и не превышает max_size."""
+        pool, created = self.make_pool(max_size=1, timeout=0.05)
+        first = pool.acquire()
+        with self.assertRaises(db.PoolTimeout):
+            pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(created), 1)
+
+    def test_pool_health_check_and_lifetime(self):
+        """Проверяем, что пул закрывает оборвавшиеся и слишком старые
+        соединения."""
+        pool, created = self.make_pool(check_interval=0)
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.usable = False
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, broken)
+        self.assertTrue(broken.closed)
+        pool.max_lifetime = 0
+        pool.release(fresh)
+        self.assertTrue(fresh.closed, 'Старое соединение вернулось в пул')
+        self.assertEqual(pool.size, 0)
+
+    @override_settings(DB_HEALTH_CHECK_INTERVAL=0)
+    def test_request_started_closes_unusable(self):
+        """Проверяем, что перед запросом оборвавшееся постоянное
+        соединение закрывается."""
+        wrapper = mock.Mock(connection=object(), in_atomic_block=False,
+                            health_checked_at=None)
+        wrapper.is_usable.return_value = False
+        with mock.patch.object(db.connections, 'all',
+                               return_value=[wrapper]):
+            db.check_connections()
+        wrapper.close.assert_called_once()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.test_user)
+
+    def route(self, url, cookies=None):
+        """База, которую роутер выбрал бы для чтения постов во время
+        запроса к url."""
+        def view(request):
+            return HttpResponse(routers.ReplicaRouter().db_for_read(Post))
+
+        request = RequestFactory().get(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+        middleware = routers.ReplicaMiddleware(view)
+        middleware.process_view(request, view, (), {})
+        return middleware(request).content.decode()
+
+    def test_read_views_use_replica(self):
+        """Проверяем, что читающие представления идут на реплику,
+        а остальные и закреплённые за основной базой — нет."""
+        self.assertEqual(self.route(reverse('posts:index')), 'replica')
+        self.assertEqual(self.route(reverse('posts:post_create')), 'default')
+        self.assertEqual(
+            self.route(reverse('posts:index'),
+                       {routers.PRIMARY_COOKIE: '1'}),
+            'default')
+        self.assertEqual(routers.ReplicaRouter().db_for_read(Post),
+                         'default', 'Флаг реплики остался после запроса')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_write_pins_primary(self):
+        """Проверяем, что после комментария ставится cookie
+        чтения из основной базы."""
+        client = Client()
+        client.force_login(self.test_user)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        self.assertIn(routers.PRIMARY_COOKIE, response.cookies)
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn(routers.PRIMARY_COOKIE, response.cookies)
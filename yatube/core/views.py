@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,20 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+
+def metrics(request):
+    """Накопленные метрики запросов для сотрудников и сборщика
+    метрик с METRICS_TOKEN.
+
+    REMOTE_ADDR за обратным прокси всегда адрес прокси, поэтому
+    по INTERNAL_IPS доступ не проверяется."""
+    if not (request.user.is_staff or _has_metrics_token(request)):
+        raise Http404
+    return JsonResponse(request_metrics.snapshot())
@@ -0,0 +1,159 @@
+"""JSON API лент для мобильного клиента.
+
+Представления используют те же запросы, что и HTML-страницы: feed(),
+detail() и курсорную пагинацию. Сильный ETag строится из версии ленты
+(см. versions) и id и дат записей страницы, Last-Modified — по самой
+новой дате. Если клиент прислал совпадающий If-None-Match или
+If-Modified-Since, ответ 304 отдаётся до сериализации.
+"""
+import hashlib
+from functools import wraps
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import Group, Post, User
+from .timeline import TimelinePaginator
+from .utils import CursorPaginator, NUMBER_OF_POSTS, comments_page
+from .versions import get_version_and_changed
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else None
+
+
+def conditional_json(request, feeds, stamps, serialize):
+    """Отвечает 304 по ETag и Last-Modified или JSON из serialize().
+
+    stamps — пары (ключ, дата) для записей, которые попадут в ответ;
+    по ним вместе с версией лент feeds считается ETag. Правка или
+    удаление записи меняют только версию, поэтому Last-Modified
+    учитывает и время её смены, как conditional_page."""
+    version, changed = get_version_and_changed(*feeds)
+    digest = hashlib.md5(version.encode())
+    dates = [changed]
+    for key, date in stamps:
+        digest.update(f'|{key}:{date.isoformat() if date else ""}'.encode())
+        dates.append(date)
+    etag = quote_etag(digest.hexdigest())
+    last_modified = _timestamp(max(filter(None, dates), default=None))
+    response = get_conditional_response(request,
+                                        etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(serialize(),
+                                json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def api_login_required(view):
+    """Как login_required, но вместо редиректа отвечает 401."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Требуется авторизация'},
+                                status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def serialize_author(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': serialize_author(post.author),
+        'group': {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        } if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'image_width': post.image_width,
+        'image_height': post.image_height,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat() if comment.created else None,
+        'author': serialize_author(comment.author),
+    }
+
+
+def feed_response(request, post_list, *feeds, paginator=None):
+    paginator = paginator or CursorPaginator(post_list, NUMBER_OF_POSTS)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    return conditional_json(
+        request,
+        feeds,
+        [(post.pk, post.pub_date) for post in page_obj],
+        lambda: {
+            'results': [serialize_post(post) for post in page_obj],
+            'next': page_obj.next_cursor,
+            'previous': page_obj.previous_cursor,
+        },
+    )
+
+
+@require_safe
+def index(request):
+    return feed_response(request, Post.objects.feed(), 'index')
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.feed(), f'group:{group.pk}')
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.feed(),
+                         f'profile:{author.pk}')
+
+
+@require_safe
+@api_login_required
+def follow_index(request):
+    paginator = TimelinePaginator(request.user, NUMBER_OF_POSTS)
+    response = feed_response(request, paginator.object_list,
+                             f'follow:{request.user.pk}',
+                             paginator=paginator)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.detail(), pk=post_id)
+    comments = comments_page(request, post.comments)
+    return conditional_json(
+        request,
+        [f'post:{post.pk}'],
+        [(f'post{post.pk}', post.pub_date)]
+        + [(comment.pk, comment.created) for comment in comments],
+        lambda: {
+            **serialize_post(post),
+            'comments_count': post.comments_count,
+            'comments': [serialize_comment(comment)
+                         for comment in comments],
+            'comments_next': comments.next_cursor,
+            'comments_previous': comments.previous_cursor,
+        },
+    )
@@ -0,0 +1,329 @@
+"""Потоковый экспорт и импорт постов в NDJSON.
+
+Каждая строка файла — одна запись с полем model: group, post, comment
+или follow. Экспорт читает таблицы через iterator(chunk_size=...),
+импорт пишет пачками bulk_create в транзакциях, поэтому расход памяти
+не зависит от размера данных. Пользователи и группы ссылаются
+по username и slug, посты и комментарии сохраняют свои id. Если id
+уже занят другим постом или комментарием (другой автор, дата или пост),
+запись пропускается вместе с комментариями к такому посту: иначе они
+перезаписали бы чужие даты или попали под чужой пост.
+Картинки передаются путями внутри MEDIA_ROOT и копируются параллельно.
+Если под тем же именем уже лежит другой файл, картинка сохраняется под
+свободным именем и загруженные посты ссылаются на него.
+"""
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import counters, images, search, timeline, versions
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+CHUNK_SIZE: int = 2000
+COPY_WORKERS: int = 8
+
+
+class ParallelCopier:
+    """Копирует файлы в пуле потоков, держа в очереди
+    ограниченное число заданий."""
+
+    def __init__(self, copy, workers=COPY_WORKERS):
+        self.copy = copy
+        self.workers = workers
+        self.executor = None
+        self.pending = set()
+        self.copied = 0
+
+    def __enter__(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def submit(self, name):
+        if len(self.pending) >= self.workers * 4:
+            done, self.pending = wait(self.pending,
+                                      return_when=FIRST_COMPLETED)
+            self._collect(done)
+        self.pending.add(self.executor.submit(self.copy, name))
+
+    def _collect(self, futures):
+        for future in futures:
+            if future.result():
+                self.copied += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        done, _ = wait(self.pending)
+        self.pending = set()
+        self.executor.shutdown()
+        if exc_type is None:
+            self._collect(done)
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, default=_serialize) + '\n'
+
+
+def export(stream, chunk_size=CHUNK_SIZE, media_dir=None):
+    """Пишет группы, посты, комментарии и подписки в поток NDJSON.
+
+    Возвращает количество записей по моделям."""
+    totals = {}
+
+    def write(model, queryset, fields, on_row=None):
+        """fields: имена полей в выгрузке и соответствующие им пути
+        в запросе."""
+        rows = queryset.order_by('pk').values_list(*fields.values())
+        for values in rows.iterator(chunk_size=chunk_size):
+            row = dict(zip(fields, values))
+            stream.write(_dump({'model': model, **row}))
+            totals[model] = totals.get(model, 0) + 1
+            if on_row is not None:
+                on_row(row)
+
+    def copy_out(name):
+        target = os.path.join(media_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with default_storage.open(name) as source, \
+                open(target, 'wb') as destination:
+            shutil.copyfileobj(source, destination)
+        return True
+
+    write('group', Group.objects, {
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    })
+    copier = ParallelCopier(copy_out) if media_dir else nullcontext()
+    with copier:
+        write('post', Post.objects, {
+            'id': 'id',
+            'text': 'text',
+            'pub_date': 'pub_date',
+            'updated': 'updated',
+            'image': 'image',
+            'author': 'author__username',
+            'group': 'group__slug',
+        }, on_row=lambda row: (copier.submit(row['image'])
+                               if media_dir and row['image'] else None))
+    write('comment', Comment.objects, {
+        'id': 'id',
+        'text': 'text',
+        'created': 'created',
+        'post': 'post_id',
+        'author': 'author__username',
+    })
+    write('follow', Follow.objects, {
+        'user': 'user__username',
+        'author': 'author__username',
+    })
+    return totals
+
+
+def _users(usernames):
+    """id пользователей по username, недостающие создаются."""
+    usernames = set(filter(None, usernames))
+    found = dict(User.objects.filter(
+        username__in=usernames).values_list('username', 'pk'))
+    missing = usernames - set(found)
+    if missing:
+        User.objects.bulk_create(
+            [User(username=username, password='!') for username in missing],
+            ignore_conflicts=True
+        )
+        found.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+    return found
+
+
+def _import_groups(rows, skipped):
+    slugs = {row['slug'] for row in rows}
+    existing = set(Group.objects.filter(slug__in=slugs).values_list(
+        'slug', flat=True))
+    Group.objects.bulk_create(
+        [Group(**row) for row in rows if row['slug'] not in existing],
+        ignore_conflicts=True
+    )
+
+
+def _import_posts(rows, skipped):
+    users = _users(row['author'] for row in rows)
+    groups = dict(Group.objects.filter(
+        slug__in={row['group'] for row in rows if row['group']}
+    ).values_list('slug', 'pk'))
+    existing = {
+        pk: (author_id, pub_date)
+        for pk, author_id, pub_date in Post.objects.filter(
+            pk__in={row['id'] for row in rows}
+        ).values_list('pk', 'author_id', 'pub_date')
+    }
+    new_rows = []
+    for row in rows:
+        if row['id'] not in existing:
+            new_rows.append(row)
+        # Тот же пост из прошлой загрузки оставляем как есть.
+        elif existing[row['id']] != (users.get(row['author']),
+                                     parse_datetime(row['pub_date'])):
+            skipped['post'].add(row['id'])
+    posts = [
+        Post(id=row['id'],
+             text=row['text'],
+             image=row['image'] or '',
+             author_id=users.get(row['author']),
+             group_id=groups.get(row['group']))
+        for row in new_rows
+    ]
+    Post.objects.bulk_create(posts, ignore_conflicts=True)
+    # auto_now_add и auto_now перезаписывают даты при вставке,
+    # возвращаем исходные. В старых выгрузках нет updated.
+    for post, row in zip(posts, new_rows):
+        post.pub_date = parse_datetime(row['pub_date'])
+        post.updated = parse_datetime(row.get('updated') or row['pub_date'])
+    Post.objects.bulk_update(posts, ['pub_date', 'updated'])
+
+
+def _import_comments(rows, skipped):
+    users = _users(row['author'] for row in rows)
+    existing_posts = set(Post.objects.filter(
+        pk__in={row['post'] for row in rows}).values_list('pk', flat=True))
+    existing = {
+        pk: (post_id, author_id)
+        for pk, post_id, author_id in Comment.objects.filter(
+            pk__in={row['id'] for row in rows}
+        ).values_list('pk', 'post_id', 'author_id')
+    }
+    new_rows = []
+    for row in rows:
+        if row['post'] not in existing_posts:
+            continue
+        if row['post'] in skipped['post'] or (
+                row['id'] in existing
+                and existing[row['id']] != (row['post'],
+                                            users[row['author']])):
+            skipped['comment'].add(row['id'])
+        elif row['id'] not in existing:
+            new_rows.append(row)
+    comments = [
+        Comment(id=row['id'],
+                text=row['text'],
+                post_id=row['post'],
+                author_id=users[row['author']])
+        for row in new_rows
+    ]
+    Comment.objects.bulk_create(comments, ignore_conflicts=True)
+    for comment, row in zip(comments, new_rows):
+        comment.created = (parse_datetime(row['created'])
+                           if row['created'] else None)
+    Comment.objects.bulk_update(comments, ['created'])
+
+
+def _import_follows(rows, skipped):
+    users = _users([row['user'] for row in rows]
+                   + [row['author'] for row in rows])
+    Follow.objects.bulk_create(
+        [Follow(user_id=users[row['user']],
+                author_id=users[row['author']])
+         for row in rows if row['user'] != row['author']],
+        ignore_conflicts=True
+    )
+
+
+IMPORTERS = {
+    'group': _import_groups,
+    'post': _import_posts,
+    'comment': _import_comments,
+    'follow': _import_follows,
+}
+
+
+def import_(stream, batch_size=CHUNK_SIZE, media_source=None,
+            rebuild=True):
+    """Читает NDJSON из потока и пишет записи пачками.
+
+    Возвращает количество прочитанных записей по моделям."""
+    totals = {}
+    skipped = {'post': set(), 'comment': set()}
+    batch, batch_model = [], None
+    # Посты из выгрузки по картинкам и картинки, сохранённые
+    # под другим именем, чем в выгрузке.
+    image_posts = {}
+    renamed = {}
+
+    def copy_in(name):
+        with open(os.path.join(media_source, name), 'rb') as source:
+            source = File(source)
+            if default_storage.exists(name):
+                if default_storage.size(name) == source.size:
+                    with default_storage.open(name) as existing:
+                        same = (images.content_hash(existing)
+                                == images.content_hash(source))
+                    if same:
+                        return False
+            saved = default_storage.save(name, source)
+        if saved != name:
+            renamed[name] = saved
+        return True
+
+    def flush():
+        if batch:
+            with transaction.atomic():
+                IMPORTERS[batch_model](batch, skipped)
+
+    copier = ParallelCopier(copy_in) if media_source else nullcontext()
+    with copier:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            model = record.pop('model')
+            if model not in IMPORTERS:
+                raise ValueError(f'Неизвестная модель: {model}')
+            if model != batch_model or len(batch) >= batch_size:
+                flush()
+                batch, batch_model = [], model
+            batch.append(record)
+            totals[model] = totals.get(model, 0) + 1
+            if media_source and model == 'post' and record['image']:
+                if record['image'] not in image_posts:
+                    copier.submit(record['image'])
+                image_posts.setdefault(record['image'], []).append(
+                    record['id'])
+        flush()
+    for name, saved in renamed.items():
+        updated = Post.objects.filter(
+            pk__in=set(image_posts[name]) - skipped['post'], image=name
+        ).update(image=saved)
+        # Посты уже были загружены раньше со своей копией картинки.
+        if not updated:
+            default_storage.delete(saved)
+    for model, ids in skipped.items():
+        if ids:
+            logger.warning('Пропущено %s: %s, id заняты другими '
+                           'записями', model, len(ids))
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Group, Post, Comment, Follow]):
+            cursor.execute(sql)
+    if rebuild:
+        counters.recount()
+        timeline.rebuild()
+        search.rebuild()
+        versions.bump_all()
+    return totals
@@ -0,0 +1,303 @@
+"""Нагрузочные замеры лент на синтетических данных.
+
+Используется командой benchmark_feeds: заполняет базу пользователями,
+группами, постами, комментариями и подписками, затем замеряет время
+ответа, число SQL-запросов и планы запросов основных страниц.
+measure_render отдельно сравнивает рендер ссылок карточек постов через
+{% url %} и через атрибуты поста (fast_reverse).
+"""
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.template import Context, Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post
+from .utils import NUMBER_OF_POSTS
+
+User = get_user_model()
+BATCH_SIZE: int = 1000
+# Адрес не из INTERNAL_IPS, чтобы debug_toolbar не влиял на замеры.
+REMOTE_ADDR: str = '192.0.2.1'
+# Ссылки карточки поста до и после перехода на fast_reverse.
+URL_TAG_LINKS: str = (
+    "{% for post in posts %}"
+    "<a href=\"{% url 'posts:profile' post.author %}\"></a>"
+    "<a href=\"{% url 'posts:post_detail' post.id %}\"></a>"
+    "{% if post.group %}"
+    "<a href=\"{% url 'posts:group_list' post.group.slug %}\"></a>"
+    "{% endif %}"
+    "{% endfor %}"
+)
+ATTRIBUTE_LINKS: str = (
+    '{% for post in posts %}'
+    '<a href="{{ post.author_url }}"></a>'
+    '<a href="{{ post.get_absolute_url }}"></a>'
+    '{% if post.group %}<a href="{{ post.group_url }}"></a>{% endif %}'
+    '{% endfor %}'
+)
+
+
+class Dataset:
+    """Параметры синтетических данных."""
+
+    def __init__(self, posts, users=None, groups=None, comments=None,
+                 follows=None, skew=1.0, seed=0):
+        self.posts = posts
+        self.users = users or max(posts // 20, 10)
+        self.groups = groups or max(posts // 200, 3)
+        self.comments = posts * 2 if comments is None else comments
+        self.follows = follows or self.users * 10
+        self.skew = skew
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _weights(count, skew):
+    """Веса Ципфа: небольшая доля авторов пишет большую часть постов."""
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def _bulk_create(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def clear():
+    with transaction.atomic():
+        for model in (Comment, Follow, Post, Group):
+            model.objects.all().delete()
+        User.objects.filter(username__startswith='bench_').delete()
+
+
+def seed(dataset):
+    """Заполняет базу синтетическими данными."""
+    rnd = random.Random(dataset.seed)
+    with transaction.atomic():
+        _bulk_create(User, (
+            User(username=f'bench_{i}', first_name='Имя', last_name=f'{i}',
+                 password='!')
+            for i in range(dataset.users)
+        ))
+        _bulk_create(Group, (
+            Group(title=f'Группа {i}', slug=f'bench-{i}',
+                  description='Описание')
+            for i in range(dataset.groups)
+        ))
+        user_ids = list(User.objects.filter(
+            username__startswith='bench_').order_by('pk').values_list(
+                'pk', flat=True))
+        group_ids = list(Group.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        author_weights = _weights(len(user_ids), dataset.skew)
+        group_weights = _weights(len(group_ids), dataset.skew)
+        _bulk_create(Post, (
+            Post(text=f'Синтетический пост {i} ' + 'текст ' * rnd.randint(
+                     5, 50),
+                 author_id=rnd.choices(user_ids, author_weights)[0],
+                 group_id=(rnd.choices(group_ids, group_weights)[0]
+                           if rnd.random() < 0.8 else None))
+            for i in range(dataset.posts)
+        ))
+        post_ids = list(Post.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        post_weights = _weights(len(post_ids), dataset.skew)
+        _bulk_create(Comment, (
+            Comment(post_id=rnd.choices(post_ids, post_weights)[0],
+                    author_id=rnd.choice(user_ids),
+                    text='Синтетический комментарий')
+            for _ in range(dataset.comments)
+        ))
+        _bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in (
+                (rnd.choice(user_ids),
+                 rnd.choices(user_ids, author_weights)[0])
+                for _ in range(dataset.follows)
+            )
+            if user_id != author_id
+        ))
+        counters.recount()
+        timeline.rebuild()
+        search.rebuild()
+
+
+def _plan_stats(queries):
+    """Полные сканирования и сортировки без индекса по EXPLAIN."""
+    stats = {'full_scans': 0, 'temp_sorts': 0}
+    if connection.vendor != 'sqlite':
+        return stats
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if detail.startswith('SCAN') and 'INDEX' not in detail:
+                    stats['full_scans'] += 1
+                if 'USE TEMP B-TREE' in detail:
+                    stats['temp_sorts'] += 1
+    return stats
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def measure(client, url, repeat):
+    """Замеряет страницу: холодный запрос без кеша и серия тёплых."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    queries = context.captured_queries
+    timings = []
+    for _ in range(repeat):
+        cache.clear()
+        start = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.get(url)
+        warm.append((time.perf_counter() - start) * 1000)
+    return {
+        'url': url,
+        'status': response.status_code,
+        'queries': len(queries),
+        'sql_ms': round(sum(float(q['time']) for q in queries) * 1000, 3),
+        **_plan_stats(queries),
+        'cold_ms': {
+            'p50': round(_percentile(timings, 50), 3),
+            'p90': round(_percentile(timings, 90), 3),
+            'p99': round(_percentile(timings, 99), 3),
+            'mean': round(statistics.mean(timings), 3),
+        },
+        'warm_ms': {
+            'p50': round(_percentile(warm, 50), 3),
+            'p90': round(_percentile(warm, 90), 3),
+            'p99': round(_percentile(warm, 99), 3),
+            'mean': round(statistics.mean(warm), 3),
+        },
+    }
+
+
+def measure_render(repeat):
+    """Время рендера ссылок одной страницы ленты: {% url %} против
+    атрибутов поста."""
+    context = Context({'posts': list(Post.objects.feed()[:NUMBER_OF_POSTS])})
+    result = {}
+    for name, code in (('url_tag', URL_TAG_LINKS),
+                       ('attributes', ATTRIBUTE_LINKS)):
+        template = Template(code)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            template.render(context)
+            timings.append((time.perf_counter() - start) * 1000)
+        result[f'{name}_ms'] = round(_percentile(timings, 50), 3)
+    result['speedup'] = round(
+        result['url_tag_ms'] / max(result['attributes_ms'], 1e-9), 2)
+    return result
+
+
+def feed_urls():
+    """Адреса страниц для замеров на самых «тяжёлых» объектах."""
+    group = Group.objects.annotate(total=Count('posts')).order_by(
+        '-total').first()
+    author = User.objects.filter(username__startswith='bench_').annotate(
+        total=Count('posts')).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count').first()
+    reader = User.objects.filter(username__startswith='bench_').annotate(
+        total=Count('follower')).order_by('-total').first()
+    urls = {'index': reverse('posts:index')}
+    if group is not None:
+        urls['group_posts'] = reverse('posts:group_list',
+                                      kwargs={'slug': group.slug})
+    if author is not None:
+        urls['profile'] = reverse('posts:profile',
+                                  kwargs={'username': author.username})
+    if post is not None:
+        urls['post_detail'] = reverse('posts:post_detail',
+                                      kwargs={'post_id': post.pk})
+    return urls, reader
+
+
+def run(dataset, repeat):
+    """Заполняет базу и замеряет все ленты."""
+    clear()
+    started = time.perf_counter()
+    seed(dataset)
+    seed_seconds = time.perf_counter() - started
+    urls, reader = feed_urls()
+    guest = Client(REMOTE_ADDR=REMOTE_ADDR)
+    views = {name: measure(guest, url, repeat) for name, url in urls.items()}
+    views['index_last_page'] = measure(
+        guest, reverse('posts:index') + '?cursor='
+        + guest.get(reverse('posts:index')).context['page_obj'].last_cursor,
+        repeat)
+    if reader is not None:
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        client.force_login(reader)
+        views['follow_index'] = measure(client,
+                                        reverse('posts:follow_index'),
+                                        repeat)
+    return {
+        'dataset': dataset.as_dict(),
+        'seed_seconds': round(seed_seconds, 3),
+        'views': views,
+        'render': measure_render(repeat),
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+    }
+
+
+def compare(report, baseline):
+    """Строки сравнения текущего отчёта с предыдущим."""
+    previous = {run['dataset']['posts']: run for run in baseline['runs']}
+    lines = []
+    for current in report['runs']:
+        size = current['dataset']['posts']
+        if size not in previous:
+            continue
+        for name, view in current['views'].items():
+            old = previous[size]['views'].get(name)
+            if old is None:
+                continue
+            ratio = view['cold_ms']['p50'] / max(old['cold_ms']['p50'],
+                                                 1e-9)
+            lines.append(
+                f'{size:>8} {name:<16} '
+                f'p50 {old["cold_ms"]["p50"]:>9.2f} -> '
+                f'{view["cold_ms"]["p50"]:>9.2f} ms ({ratio:.2f}x), '
+                f'queries {old["queries"]} -> {view["queries"]}'
+            )
+    return lines
@@ -0,0 +1,72 @@
+"""Условные GET-запросы для HTML-страниц.
+
+Декоратор conditional_page до вызова представления считает ETag
+по версиям лент страницы (см. versions) и пользователю, а Last-Modified —
+по самой новой дате из дешёвого запроса и времени смены версии.
+Совпавший If-None-Match или If-Modified-Since даёт 304 без запросов
+за данными и рендера шаблона. Заголовки Cache-Control и Vary: Cookie
+позволяют обратному прокси кешировать страницы гостей.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .versions import get_version_and_changed
+
+
+def _etag(request, version):
+    digest = hashlib.md5(version.encode())
+    if request.user.is_authenticated:
+        # В странице пользователя есть его имя и CSRF-токен формы.
+        digest.update(f'|{request.user.pk}'.encode())
+        digest.update(f'|{request.META.get("CSRF_COOKIE", "")}'.encode())
+    return quote_etag(digest.hexdigest())
+
+
+def patch_page_caching(request, response):
+    """Гостевые страницы можно держать в общем кеше, страницы
+    пользователей — только в кеше браузера с перепроверкой."""
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response,
+                            public=True,
+                            max_age=0,
+                            s_maxage=settings.PROXY_CACHE_MAX_AGE)
+    patch_vary_headers(response, ('Cookie',))
+
+
+def conditional_page(state):
+    """state(request, **kwargs) возвращает имена лент страницы
+    и дату самой новой записи на ней или None, если объекта нет."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            current = state(request, *args, **kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+            names, newest = current
+            version, changed = get_version_and_changed(*names)
+            etag = _etag(request, version)
+            # Версию данных страницы использует skeleton_cache.
+            request.page_version = version
+            last_modified = int(max(filter(None, (newest, changed)))
+                                .timestamp())
+            response = get_conditional_response(request,
+                                                etag=etag,
+                                                last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_page_caching(request, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,87 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F()-выражения из сигналов,
+а команда recount_stats пересчитывает их с нуля, если они разошлись.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+RECOUNT_BATCH_SIZE: int = 1000
+
+
+def _delta(field, value):
+    if value >= 0:
+        return F(field) + value
+    return Greatest(F(field) + value, 0)
+
+
+def change_author_stats(author_id, **deltas):
+    """Меняет счётчики автора на указанные величины."""
+    if author_id is None:
+        return
+    updates = {field: _delta(field, value) for field, value in deltas.items()}
+    if AuthorStats.objects.filter(author_id=author_id).update(**updates):
+        return
+    # Строки нет: уменьшать нечего, а при удалении пользователя каскад
+    # уже удалил его счётчики и создавать их заново нельзя.
+    if all(value <= 0 for value in deltas.values()):
+        return
+    if not User.objects.filter(pk=author_id).exists():
+        return
+    try:
+        with transaction.atomic():
+            AuthorStats.objects.create(
+                author_id=author_id,
+                **{field: max(value, 0) for field, value in deltas.items()}
+            )
+    except IntegrityError:
+        AuthorStats.objects.filter(author_id=author_id).update(**updates)
+
+
+def change_comments_count(post_id, value):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_delta('comments_count', value))
+
+
+def get_author_stats(author):
+    """Счётчики автора без дополнительного запроса, если они
+    подгружены через select_related('stats')."""
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(author=author)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики по исходным таблицам."""
+    with transaction.atomic():
+        Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+        AuthorStats.objects.all().delete()
+        users = User.objects.annotate(
+            posts_total=_count(Post.objects, 'author'),
+            followers_total=_count(Follow.objects, 'author'),
+            following_total=_count(Follow.objects, 'user'),
+        ).values_list('pk', 'posts_total', 'followers_total',
+                      'following_total')
+        batch = []
+        for pk, posts, followers, following in users.iterator():
+            batch.append(AuthorStats(author_id=pk,
+                                     posts_count=posts,
+                                     followers_count=followers,
+                                     following_count=following))
+            if len(batch) >= RECOUNT_BATCH_SIZE:
+                AuthorStats.objects.bulk_create(batch)
+                batch = []
+        AuthorStats.objects.bulk_create(batch)
@@ -1,12 +1,41 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
+class PostImageField(forms.ImageField):
+    def to_python(self, data):
+        # Слишком большой файл SizeLimitUploadHandler не дочитал,
+        # Pillow его не откроет.
+        if isinstance(data, UploadedFile):
+            images.check_size(data)
+        return super().to_python(data)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': PostImageField}
+
+    def clean_image(self):
+        """Нормализует новую картинку, одинаковые картинки
+        хранятся одним файлом."""
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        image, image_hash, _ = images.normalize(image)
+        self.instance.image_hash = image_hash
+        existing = Post.objects.filter(image_hash=image_hash).exclude(
+            image='').values_list('image', 'image_width',
+                                  'image_height').first()
+        if existing is None:
+            return image
+        name, self.instance.image_width, self.instance.image_height = (
+            existing)
+        return name
 
 
 class CommentForm(forms.ModelForm):
@@ -0,0 +1,145 @@
+"""Нормализация картинок постов при загрузке.
+
+SizeLimitUploadHandler считает байты загружаемого файла и, как только
+их больше POST_IMAGE_MAX_BYTES, перестаёт принимать файл: вместо него
+форма получает OversizedUpload и отвечает ошибкой. Дальше Pillow
+открывает лишь заголовок, пока не проверено число пикселей
+(POST_IMAGE_MAX_PIXELS). Картинка поворачивается по EXIF, уменьшается
+до POST_IMAGE_MAX_SIDE по большей стороне и пересжимается с качеством
+POST_IMAGE_QUALITY без EXIF: JPEG, PNG и WebP в свой формат, TIFF, BMP
+и прочие — в PNG. Как есть сохраняется только GIF, в том числе
+анимированный: EXIF в нём не бывает. SHA-256 итоговых байтов позволяет
+не хранить одинаковые картинки дважды.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Исходный формат -> формат после пересжатия и расширение файла.
+REENCODED_FORMATS = {
+    'JPEG': ('JPEG', '.jpg'),
+    'MPO': ('JPEG', '.jpg'),
+    'PNG': ('PNG', '.png'),
+    'WEBP': ('WEBP', '.webp'),
+}
+DEFAULT_FORMAT: tuple = ('PNG', '.png')
+KEPT_FORMATS: tuple = ('GIF',)
+PNG_MODES: tuple = ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA')
+
+
+class OversizedUpload(UploadedFile):
+    """Файл, приём которого прерван: данных нет, size — сколько
+    байтов успело прийти."""
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Перестаёт принимать файл, когда он превысил
+    POST_IMAGE_MAX_BYTES. Стоит первым в FILE_UPLOAD_HANDLERS: пока
+    он возвращает None, следующие обработчики данных не получают."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return OversizedUpload(self.file_name, self.content_type,
+                                   self.received)
+        return None
+
+
+def check_size(file):
+    if file.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s',
+            params={'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES)},
+            code='file_too_large')
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _save_options(image_format, image):
+    # PNG без exif=b'' переписывает EXIF из image.info.
+    options = {'optimize': True, 'exif': b''}
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.POST_IMAGE_QUALITY
+    if image_format == 'JPEG':
+        options['progressive'] = True
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    return options
+
+
+def normalize(file):
+    """Проверяет и пересжимает загруженную картинку.
+
+    Возвращает файл для сохранения, SHA-256 его содержимого и размеры.
+    Если картинка не проходит ограничения или не читается,
+    бросает ValidationError."""
+    check_size(file)
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+                raise ValidationError('Слишком большое разрешение картинки',
+                                      code='too_many_pixels')
+            if image.format in KEPT_FORMATS:
+                if max(image.size) > settings.POST_IMAGE_MAX_SIDE:
+                    raise ValidationError(
+                        'Сторона картинки больше %(limit)s пикселей',
+                        params={'limit': settings.POST_IMAGE_MAX_SIDE},
+                        code='too_large')
+                return file, content_hash(file), image.size
+            image_format, extension = REENCODED_FORMATS.get(
+                image.format, DEFAULT_FORMAT)
+            image.load()
+            if getattr(image, '_tile_orientation', None):
+                # TIFF через libtiff поворачивается уже при загрузке,
+                # но тег ориентации остаётся: второй поворот не нужен.
+                normalized = image.copy()
+            else:
+                normalized = ImageOps.exif_transpose(image)
+            normalized.thumbnail((settings.POST_IMAGE_MAX_SIDE,
+                                  settings.POST_IMAGE_MAX_SIDE),
+                                 Image.LANCZOS)
+            if (image_format == 'JPEG'
+                    and normalized.mode not in ('RGB', 'L')):
+                normalized = normalized.convert('RGB')
+            elif image_format == 'PNG' and normalized.mode not in PNG_MODES:
+                normalized = normalized.convert(
+                    'RGBA' if 'A' in normalized.mode else 'RGB')
+            buffer = BytesIO()
+            normalized.save(buffer, image_format,
+                            **_save_options(image_format, image))
+    except (OSError, Image.DecompressionBombError, ValueError) as error:
+        # Обрезанный файл Pillow замечает только при декодировании.
+        raise ValidationError('Не удалось прочитать картинку',
+                              code='invalid_image') from error
+    content = buffer.getvalue()
+    name = os.path.splitext(os.path.basename(file.name))[0] + extension
+    return (ContentFile(content, name=name),
+            hashlib.sha256(content).hexdigest(),
+            normalized.size)
@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts.benchmark import Dataset, compare, environment, run
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными и замеряет '
+            'время ответа и SQL-запросы лент')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000',
+                            help='Количество постов через запятую')
+        parser.add_argument('--users', type=int, default=None)
+        parser.add_argument('--groups', type=int, default=None)
+        parser.add_argument('--comments', type=int, default=None)
+        parser.add_argument('--follows', type=int, default=None)
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Перекос распределения Ципфа, 0 - равномерно')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Количество запросов к каждой странице')
+        parser.add_argument('--output', default=None,
+                            help='Файл для JSON-отчёта')
+        parser.add_argument('--compare', default=None,
+                            help='JSON-отчёт предыдущего запуска')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes должен быть списком чисел')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                runs = [
+                    run(Dataset(size,
+                                users=options['users'],
+                                groups=options['groups'],
+                                comments=options['comments'],
+                                follows=options['follows'],
+                                skew=options['skew'],
+                                seed=options['seed']),
+                        options['repeat'])
+                    for size in sizes
+                ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = {'environment': environment(), 'runs': runs}
+        for result in runs:
+            size = result['dataset']['posts']
+            for name, view in result['views'].items():
+                self.stdout.write(
+                    f'{size:>8} {name:<16} '
+                    f'p50 {view["cold_ms"]["p50"]:>9.2f} ms '
+                    f'p99 {view["cold_ms"]["p99"]:>9.2f} ms '
+                    f'warm p50 {view["warm_ms"]["p50"]:>9.2f} ms '
+                    f'queries {view["queries"]:>3} '
+                    f'scans {view["full_scans"]} sorts {view["temp_sorts"]}'
+                )
+            render = result['render']
+            self.stdout.write(
+                f'{size:>8} {"card_links":<16} '
+                f'url tag {render["url_tag_ms"]:>9.2f} ms '
+                f'attributes {render["attributes_ms"]:>9.2f} ms '
+                f'({render["speedup"]:.2f}x)'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            for line in compare(report, baseline):
+                self.stdout.write(line)
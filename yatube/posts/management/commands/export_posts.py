@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.backup import CHUNK_SIZE, export
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки '
+            'в файл NDJSON потоком, не загружая таблицы в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+                            help='Файл для выгрузки, «-» - стандартный вывод')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Количество строк, читаемых из базы за раз')
+        parser.add_argument('--media-dir', default=None,
+                            help='Каталог, куда скопировать картинки постов')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            totals = export(sys.stdout,
+                            chunk_size=options['chunk_size'],
+                            media_dir=options['media_dir'])
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file:
+                totals = export(file,
+                                chunk_size=options['chunk_size'],
+                                media_dir=options['media_dir'])
+        # Отчёт в stderr, чтобы не смешивать его с выгрузкой в stdout.
+        self.stderr.write(self.style.SUCCESS(
+            'Выгружено: ' + ', '.join(f'{model} {count}'
+                                      for model, count in totals.items())
+        ))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.backup import CHUNK_SIZE, import_
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из файла '
+            'NDJSON, созданного командой export_posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+                            help='Файл выгрузки, «-» - стандартный ввод')
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE,
+                            help='Количество записей в одной транзакции')
+        parser.add_argument('--media-source', default=None,
+                            help='Каталог с картинками постов из выгрузки')
+        parser.add_argument('--no-rebuild', action='store_false',
+                            dest='rebuild',
+                            help='Не пересчитывать счётчики, ленты '
+                                 'и поисковый индекс после загрузки')
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'batch_size': options['batch_size'],
+            'media_source': options['media_source'],
+            'rebuild': options['rebuild'],
+        }
+        try:
+            if options['path'] == '-':
+                totals = import_(sys.stdin, **kwargs)
+            else:
+                with open(options['path'], encoding='utf-8') as file:
+                    totals = import_(file, **kwargs)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Не удалось загрузить выгрузку: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено: ' + ', '.join(f'{model} {count}'
+                                      for model, count in totals.items())
+        ))
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    comments = Comment.objects.values('post').annotate(
+        total=models.Count('pk')).order_by()
+    for row in comments:
+        Post.objects.filter(pk=row['post']).update(
+            comments_count=row['total'])
+    stats = {}
+    counters = (
+        ('posts_count', Post.objects.exclude(author=None), 'author'),
+        ('followers_count', Follow.objects, 'author'),
+        ('following_count', Follow.objects, 'user'),
+    )
+    for counter, queryset, field in counters:
+        rows = queryset.values(field).annotate(
+            total=models.Count('pk')).order_by()
+        for row in rows:
+            stats.setdefault(row[field], {})[counter] = row['total']
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=author_id, **values)
+         for author_id, values in stats.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Количество постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Количество подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики автора',
+                'verbose_name_plural': 'Счётчики авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:11
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+    'text, tokenize="unicode61 remove_diacritics 2")',
+    'INSERT INTO posts_post_fts (rowid, text) '
+    'SELECT id, text FROM posts_post',
+]
+SQLITE_BACKWARD = ['DROP TABLE IF EXISTS posts_post_fts']
+
+POSTGRES_FORWARD = [
+    'CREATE TABLE posts_post_search ('
+    'post_id integer PRIMARY KEY '
+    'REFERENCES posts_post (id) ON DELETE CASCADE '
+    'DEFERRABLE INITIALLY DEFERRED, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX posts_post_search_document_idx '
+    'ON posts_post_search USING GIN (document)',
+    "INSERT INTO posts_post_search (post_id, document) "
+    "SELECT id, to_tsvector('russian', text) FROM posts_post",
+]
+POSTGRES_BACKWARD = ['DROP TABLE IF EXISTS posts_post_search']
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor,
+                                           [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD,
+                 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 
 from core.models import CreatedModel
+from core.urlresolvers import fast_reverse
 
 User = get_user_model()
 
@@ -21,6 +22,26 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'id', 'text', 'pub_date', 'updated', 'image', 'image_width',
+        'image_height', 'author', 'group',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__slug', 'group__title',
+    )
+
+    def feed(self):
+        """Посты для лент: автор и группа одним запросом,
+        только поля, нужные карточке поста."""
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS)
+
+    def detail(self):
+        """Пост для страницы поста вместе с автором, его счётчиками
+        и группой."""
+        return self.select_related('author', 'author__stats', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -28,8 +49,7 @@ class Post(models.Model):
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True,
-        db_index=True
+        auto_now_add=True
     )
     author = models.ForeignKey(
         User,
@@ -53,15 +73,83 @@ class Post(models.Model):
         blank=True,
         help_text='Выберите картинку'
     )
+    # Размеры исходной картинки: по ним шаблон резервирует место
+    # под картинку, пока она загружается.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    # SHA-256 нормализованной картинки: одинаковые загрузки
+    # ссылаются на один файл.
+    image_hash = models.CharField(
+        'Хеш картинки',
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('comments_count',)
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты фильтруют по группе или автору и сортируют
+        # по (-pub_date, -pk), см. FEED_ORDERING.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:15]
 
+    def get_absolute_url(self):
+        return fast_reverse('posts:post_detail', self.pk)
+
+    @property
+    def author_url(self):
+        return fast_reverse('posts:profile', self.author.username)
+
+    @property
+    def group_url(self):
+        return fast_reverse('posts:group_list', self.group.slug)
+
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F()-выражения,
+        # обычное сохранение не должно затирать их устаревшим значением.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -83,6 +171,10 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -115,8 +207,72 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        # Подписчики автора: рассылка постов по лентам и счётчики.
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
         verbose_name = 'Подписка',
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx')
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Количество постов',
+                                              default=0)
+    followers_count = models.PositiveIntegerField('Количество подписчиков',
+                                                  default=0)
+    following_count = models.PositiveIntegerField('Количество подписок',
+                                                  default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return f'Счётчики {self.author}'
@@ -0,0 +1,211 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite используется виртуальная таблица FTS5, на PostgreSQL —
+таблица с колонкой tsvector и GIN-индексом. Обе создаются миграцией
+0016_search_index и обновляются сигналами при сохранении и удалении
+поста. На остальных СУБД поиск деградирует до icontains.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Post
+
+REBUILD_BATCH_SIZE: int = 1000
+SQLITE_TABLE: str = 'posts_post_fts'
+POSTGRES_TABLE: str = 'posts_post_search'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SqliteSearchBackend:
+    """Поиск через SQLite FTS5, ранжирование по bm25."""
+
+    def _match(self, query):
+        tokens = TOKEN_RE.findall(query)
+        return ' '.join(f'"{token}"' for token in tokens)
+
+    def index(self, post_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post_id])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post_id, text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post_id])
+
+    def search_ids(self, query, limit, offset=0):
+        match = self._match(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SQLITE_TABLE} '
+                f'WHERE {SQLITE_TABLE} MATCH %s '
+                f'ORDER BY bm25({SQLITE_TABLE}), rowid DESC '
+                f'LIMIT %s OFFSET %s',
+                [match, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, query):
+        match = self._match(query)
+        if not match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {SQLITE_TABLE} '
+                f'WHERE {SQLITE_TABLE} MATCH %s',
+                [match])
+            return cursor.fetchone()[0]
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+
+    def index_many(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, text) VALUES (%s, %s)',
+                rows)
+
+
+class PostgresSearchBackend:
+    """Поиск через tsvector/GIN, ранжирование по ts_rank."""
+
+    @property
+    def config(self):
+        return settings.SEARCH_CONFIG
+
+    def index(self, post_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) '
+                f'VALUES (%s, to_tsvector(%s::regconfig, %s)) '
+                f'ON CONFLICT (post_id) '
+                f'DO UPDATE SET document = EXCLUDED.document',
+                [post_id, self.config, text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {POSTGRES_TABLE} WHERE post_id = %s',
+                [post_id])
+
+    def search_ids(self, query, limit, offset=0):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {POSTGRES_TABLE}, '
+                f'plainto_tsquery(%s::regconfig, %s) AS query '
+                f'WHERE document @@ query '
+                f'ORDER BY ts_rank(document, query) DESC, post_id DESC '
+                f'LIMIT %s OFFSET %s',
+                [self.config, query, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {POSTGRES_TABLE} '
+                f'WHERE document @@ plainto_tsquery(%s::regconfig, %s)',
+                [self.config, query])
+            return cursor.fetchone()[0]
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+
+    def index_many(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) '
+                f'VALUES (%s, to_tsvector(%s::regconfig, %s))',
+                [(post_id, self.config, text) for post_id, text in rows])
+
+
+class FallbackSearchBackend:
+    """Поиск без индекса для остальных СУБД."""
+
+    def _queryset(self, query):
+        queryset = Post.objects.all()
+        for token in TOKEN_RE.findall(query):
+            queryset = queryset.filter(text__icontains=token)
+        return queryset
+
+    def index(self, post_id, text):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def search_ids(self, query, limit, offset=0):
+        if not TOKEN_RE.search(query):
+            return []
+        return list(self._queryset(query).values_list(
+            'pk', flat=True)[offset:offset + limit])
+
+    def count(self, query):
+        if not TOKEN_RE.search(query):
+            return 0
+        return self._queryset(query).count()
+
+    def clear(self):
+        pass
+
+    def index_many(self, rows):
+        pass
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+
+class SearchResults:
+    """Ленивый список найденных постов в порядке релевантности.
+
+    Подходит для django.core.paginator.Paginator: считает результаты
+    отдельным запросом и загружает только посты текущей страницы.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.backend = get_backend()
+
+    def count(self):
+        return self.backend.count(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        ids = self.backend.search_ids(self.query, key.stop - start, start)
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def rebuild():
+    """Перестраивает поисковый индекс по всем постам."""
+    backend = get_backend()
+    posts = Post.objects.order_by().values_list('pk', 'text')
+    with transaction.atomic():
+        backend.clear()
+        rows = []
+        for row in posts.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            rows.append(row)
+            if len(rows) >= REBUILD_BATCH_SIZE:
+                backend.index_many(rows)
+                rows = []
+        backend.index_many(rows)
@@ -0,0 +1,189 @@
+from django.conf import settings
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import counters, tasks, thumbnails, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(pre_save, sender=Post)
+def remember_image_size(sender, instance, raw=False, **kwargs):
+    # Размеры читаются из заголовка только что загруженного файла.
+    if raw or 'image' in instance.get_deferred_fields():
+        return
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.image_hash = ''
+    elif not instance.image._committed:
+        instance.image_width = instance.image.width
+        instance.image_height = instance.image.height
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tasks.push_post.delay(instance.pk, key=f'push_post:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(*versions.post_feeds(instance))
+        instance._initial_group_id = instance.group_id
+        # Новый пост сбрасывает ленты подписок в push_post.
+        if not kwargs.get('created'):
+            tasks.bump_follower_feeds.delay(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tasks.backfill_timeline.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    tasks.prune_timeline.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(f'follow:{instance.user_id}',
+                      f'profile:{instance.author_id}')
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_author_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_author_stats(instance.author_id, followers_count=1)
+        counters.change_author_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, followers_count=-1)
+    counters.change_author_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_delete, sender=Follow)
+def refill_timelines(sender, instance, **kwargs):
+    # Регистрируется после uncount_follow: проверяется уже
+    # уменьшенный счётчик подписчиков.
+    if timeline.left_celebrities(instance.author_id):
+        tasks.refill_timelines.delay(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.index_post.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    tasks.remove_post_from_index.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def generate_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    # Без воркера задача выполнилась бы прямо в запросе,
+    # а пул потоков создаст миниатюры после ответа.
+    if settings.TASKS_ALWAYS_EAGER:
+        thumbnails.schedule(instance.image.name)
+    else:
+        tasks.generate_thumbnails.delay(
+            instance.image.name, key=f'thumbnails:{instance.image.name}')
+
+
+AUTHOR_CARD_FIELDS: tuple = ('username', 'first_name', 'last_name')
+
+
+def _author_card(user):
+    return tuple(user.__dict__.get(field) for field in AUTHOR_CARD_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_author_card(sender, instance, **kwargs):
+    instance._initial_card = _author_card(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, raw=False, **kwargs):
+    # При входе и смене пароля имя и username не меняются.
+    card = _author_card(instance)
+    if created or raw or card == getattr(instance, '_initial_card', None):
+        return
+    instance._initial_card = card
+    versions.bump(f'author:{instance.pk}')
+    tasks.bump_author_feeds.delay(instance.pk)
+
+
+def invalidate_group_links(group):
+    """Сбрасывает карточки со ссылкой на группу и ленты с ними."""
+    versions.bump(f'group-info:{group.pk}', f'group:{group.pk}')
+    authors = group.posts.order_by().values_list(
+        'author_id', flat=True).distinct()
+    for author_id in authors:
+        tasks.bump_author_feeds.delay(author_id)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._initial_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_cards(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    if instance.slug == getattr(instance, '_initial_slug', instance.slug):
+        versions.bump(f'group:{instance.pk}')
+        return
+    instance._initial_slug = instance.slug
+    invalidate_group_links(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_cards(sender, instance, **kwargs):
+    # После удаления у постов уже не будет ссылки на группу.
+    invalidate_group_links(instance)
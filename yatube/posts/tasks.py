@@ -0,0 +1,71 @@
+"""Фоновые задачи постов: рассылка по лентам, поиск и миниатюры.
+
+Задачи ставятся в очередь сигналами (см. signals) и получают только
+id, поэтому работают с актуальным состоянием базы: если пост успели
+удалить, задача ничего не делает.
+"""
+from tasks.queue import task
+
+from . import search, thumbnails, timeline, versions
+from .models import Follow, Post
+
+
+@task
+def push_post(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'author', 'pub_date').first()
+    if post is None:
+        return
+    timeline.push_post(post)
+    # Кеш лент подписчиков мог обновиться до рассылки.
+    versions.bump(*versions.follower_feeds(post.author_id))
+
+
+@task
+def bump_follower_feeds(author_id):
+    versions.bump(*versions.follower_feeds(author_id))
+
+
+@task
+def bump_author_feeds(author_id):
+    versions.bump(*versions.author_feeds(author_id))
+
+
+@task
+def backfill_timeline(user_id, author_id):
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+        versions.bump(f'follow:{user_id}')
+
+
+@task
+def prune_timeline(user_id, author_id):
+    timeline.prune(user_id, author_id)
+    versions.bump(f'follow:{user_id}')
+
+
+@task
+def refill_timelines(author_id):
+    if not timeline.is_celebrity(author_id):
+        timeline.refill(author_id)
+        versions.bump(*versions.follower_feeds(author_id))
+
+
+@task
+def index_post(post_id):
+    text = Post.objects.filter(pk=post_id).values_list(
+        'text', flat=True).first()
+    if text is None:
+        search.get_backend().remove(post_id)
+    else:
+        search.get_backend().index(post_id, text)
+
+
+@task
+def remove_post_from_index(post_id):
+    search.get_backend().remove(post_id)
+
+
+@task(after_commit=True)
+def generate_thumbnails(name):
+    thumbnails.create(name)
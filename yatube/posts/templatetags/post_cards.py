@@ -0,0 +1,62 @@
+"""Кеш отрендеренных карточек постов.
+
+Когда истекает кеш целой ленты, страница собирается из карточек,
+закешированных по отдельности. Ключ карточки включает id поста, время
+его изменения (updated) и версии имени автора, группы и миниатюр
+(см. versions), поэтому карточка перерисовывается, только когда
+изменилось то, что в ней показано.
+"""
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from ..versions import FEED_CACHE_TIMEOUT, get_versions
+
+CARD_TEMPLATE: str = 'posts/includes/post_card.html'
+CARD_CACHE_PREFIX: str = 'post-card'
+
+register = template.Library()
+
+
+def card_versions(post):
+    names = [f'author:{post.author_id}', f'post-card:{post.pk}']
+    if post.group_id:
+        names.append(f'group-info:{post.group_id}')
+    return names
+
+
+def card_key(post, versions, options):
+    digest = hashlib.md5('|'.join(
+        versions[name] for name in card_versions(post)).encode()).hexdigest()
+    updated = int(post.updated.timestamp() * 1000000)
+    return f'{CARD_CACHE_PREFIX}:{post.pk}:{updated}:{digest}:{options}'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, hide_author=False, hide_group=False):
+    """Карточки постов через <hr>: из кеша, недостающие рендерятся
+    и кешируются."""
+    posts = list(posts or ())
+    versions = get_versions({name for post in posts
+                             for name in card_versions(post)})
+    options = f'{int(hide_author)}{int(hide_group)}'
+    keys = [card_key(post, versions, options) for post in posts]
+    cached = cache.get_many(keys)
+    card_template = context.template.engine.get_template(CARD_TEMPLATE)
+    cards = []
+    missing = {}
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            card = card_template.render(context.new({
+                'post': post,
+                'hide_author': hide_author,
+                'hide_group': hide_group,
+            }))
+            missing[key] = card
+        cards.append(card)
+    if missing:
+        cache.set_many(missing, FEED_CACHE_TIMEOUT)
+    return mark_safe('\n<hr>\n'.join(cards))
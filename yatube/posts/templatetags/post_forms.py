@@ -0,0 +1,11 @@
+from django import template
+
+from ..forms import CommentForm
+
+register = template.Library()
+
+
+@register.simple_tag
+def comment_form():
+    """Пустая форма комментария для фрагмента страницы поста."""
+    return CommentForm()
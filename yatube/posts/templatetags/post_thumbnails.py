@@ -0,0 +1,18 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, geometry, **options):
+    """Готовая миниатюра картинки или None, если она ещё создаётся."""
+    return thumbnails.get_thumbnail(image, geometry, **options)
+
+
+@register.simple_tag
+def post_image_set(image):
+    """Варианты картинки для <picture> или None, если миниатюры
+    ещё создаются."""
+    return thumbnails.image_set(image)
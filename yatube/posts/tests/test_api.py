@@ -0,0 +1,104 @@
+import time
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test_slug',
+                                         description='Тестовое описание')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author,
+                                       group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feeds_return_posts(self):
+        """Проверяем, что ленты API отдают посты в JSON."""
+        urls = {
+            reverse('posts:api_index'): self.guest_client,
+            reverse('posts:api_group_list',
+                    kwargs={'slug': self.group.slug}): self.guest_client,
+            reverse('posts:api_profile', args=[self.author.username]):
+            self.guest_client,
+            reverse('posts:api_follow_index'): self.authorized_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                results = response.json()['results']
+                self.assertEqual([post['id'] for post in results],
+                                 [self.post.pk])
+                self.assertEqual(results[0]['group']['slug'],
+                                 self.group.slug)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_follow_requires_login(self):
+        """Проверяем, что лента подписок API отвечает 401 гостю."""
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_not_modified(self):
+        """Проверяем, что при совпадении ETag ответ 304 отдаётся
+        без сериализации, а после изменения ленты ETag меняется."""
+        url = reverse('posts:api_post_detail',
+                      kwargs={'post_id': self.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        Comment.objects.create(post=self.post,
+                               author=self.reader,
+                               text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['comments'][0]['text'],
+                         'Комментарий')
+
+    def test_if_modified_since_after_edit_and_delete(self):
+        """Проверяем, что правка и удаление поста меняют Last-Modified,
+        и клиент с одним If-Modified-Since не получает 304."""
+        other = Post.objects.create(text='Новый пост', author=self.author)
+        index = reverse('posts:api_index')
+        detail = reverse('posts:api_post_detail',
+                         kwargs={'post_id': self.post.pk})
+        changes = (
+            ('правка', lambda: Post.objects.get(pk=self.post.pk).save(),
+             (index, detail)),
+            ('удаление', other.delete, (index,)),
+        )
+        for shift, (name, change, urls) in enumerate(changes, 1):
+            since = {url: self.guest_client.get(url)['Last-Modified']
+                     for url in urls}
+            # Заголовок с точностью до секунды: изменение — позже.
+            with mock.patch('posts.versions.time.time',
+                            return_value=time.time() + 60 * shift):
+                change()
+            for url in urls:
+                with self.subTest(change=name, url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=since[url])
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
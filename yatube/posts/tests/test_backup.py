@@ -0,0 +1,134 @@
+import datetime as dt
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import AuthorStats, Comment, Follow, Group, Post
+from ..search import SearchResults
+
+User = get_user_model()
+
+
+class BackupTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test_slug',
+                                         description='Тестовое описание')
+        cls.post = Post.objects.create(text='Пост про котиков',
+                                       author=cls.author,
+                                       group=cls.group)
+        cls.pub_date = timezone.now() - dt.timedelta(days=3, microseconds=7)
+        Post.objects.filter(pk=cls.post.pk).update(pub_date=cls.pub_date)
+        cls.comment = Comment.objects.create(post=cls.post,
+                                             author=cls.reader,
+                                             text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'posts.ndjson')
+        self.addCleanup(os.remove, path)
+        call_command('export_posts', path, chunk_size=1, stderr=StringIO(),
+                     **options)
+        return path
+
+    def test_round_trip(self):
+        """Проверяем, что после выгрузки и загрузки в пустую базу
+        данные и производные таблицы восстанавливаются."""
+        path = self.export()
+        for model in (Comment, Follow, Post, Group):
+            model.objects.all().delete()
+        call_command('import_posts', path, batch_size=1, stdout=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(post.group.slug, self.group.slug)
+        self.assertEqual(post.pub_date, self.pub_date,
+                         'Дата публикации не сохранилась')
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk,
+                                               post=post,
+                                               author=self.reader).exists())
+        self.assertTrue(Follow.objects.filter(user=self.reader,
+                                              author=self.author).exists())
+        self.assertEqual(post.comments_count, 1,
+                         'Счётчик комментариев не пересчитан')
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.author).followers_count, 1,
+            'Счётчик подписчиков не пересчитан')
+        self.assertEqual(list(self.reader.timeline.values_list(
+            'post_id', flat=True)), [post.pk], 'Лента подписок не собрана')
+        self.assertEqual(list(SearchResults('котиков')[0:10]), [post],
+                         'Поисковый индекс не перестроен')
+
+    def test_import_is_idempotent(self):
+        """Проверяем, что повторная загрузка не создаёт дубликаты."""
+        path = self.export()
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Group.objects.count(), 1)
+
+    def test_import_skips_conflicting_ids(self):
+        """Проверяем, что пост и комментарий с id, занятым другой
+        записью, не портят её и не переносят чужие комментарии."""
+        path = self.export()
+        Comment.objects.all().delete()
+        Post.objects.all().delete()
+        other = Post.objects.create(id=self.post.pk,
+                                    text='Другой пост',
+                                    author=self.reader)
+        with self.assertLogs('posts.backup', 'WARNING'):
+            call_command('import_posts', path, stdout=StringIO())
+        other.refresh_from_db()
+        self.assertEqual(other.author, self.reader)
+        self.assertNotEqual(other.pub_date, self.pub_date,
+                            'Дата чужого поста перезаписана')
+        self.assertFalse(Comment.objects.filter(post=other).exists(),
+                         'Комментарий попал под чужой пост')
+
+    def test_import_keeps_other_image_with_same_name(self):
+        """Проверяем, что картинка из выгрузки не подменяется чужим
+        файлом с тем же именем, а сохраняется под свободным."""
+        media_root = tempfile.mkdtemp()
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            name = default_storage.save('posts/pic.png',
+                                        ContentFile(b'imported'))
+            Post.objects.filter(pk=self.post.pk).update(image=name)
+            path = self.export(media_dir=media_dir)
+            Comment.objects.all().delete()
+            Post.objects.all().delete()
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(b'other'))
+            other = Post.objects.create(text='Другой пост',
+                                        author=self.reader)
+            Post.objects.filter(pk=other.pk).update(image=name)
+            call_command('import_posts', path, media_source=media_dir,
+                         stdout=StringIO())
+            imported = Post.objects.get(pk=self.post.pk)
+            self.assertNotEqual(imported.image.name, name,
+                                'Пост ссылается на чужой файл')
+            with imported.image.open() as image:
+                self.assertEqual(image.read(), b'imported')
+            with default_storage.open(name) as image:
+                self.assertEqual(image.read(), b'other',
+                                 'Чужой файл перезаписан')
+            self.assertEqual(Post.objects.get(pk=other.pk).image.name, name)
+            call_command('import_posts', path, media_source=media_dir,
+                         stdout=StringIO())
+            self.assertEqual(len(default_storage.listdir('posts')[1]), 2,
+                             'Тот же файл сохранён повторно')
@@ -0,0 +1,42 @@
+from http import HTTPStatus
+
+from django.test import TestCase
+
+from ..benchmark import Dataset, compare, run, seed
+from ..models import Comment, Follow, Post, TimelineEntry
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_is_reproducible(self):
+        """Проверяем, что синтетические данные заполняются
+        с заданными размерами и согласованными производными таблицами."""
+        dataset = Dataset(40, users=10, groups=3, comments=30, follows=20,
+                          seed=1)
+        seed(dataset)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            Post.objects.filter(
+                author__following__isnull=False
+            ).values('author__following').count(),
+            'Ленты подписок не построены'
+        )
+
+    def test_run_reports_all_views(self):
+        """Проверяем, что отчёт содержит замеры всех лент."""
+        result = run(Dataset(30, seed=2), repeat=2)
+        self.assertEqual(
+            set(result['views']),
+            {'index', 'group_posts', 'profile', 'post_detail',
+             'index_last_page', 'follow_index'}
+        )
+        for name, view in result['views'].items():
+            with self.subTest(view=name):
+                self.assertEqual(view['status'], HTTPStatus.OK)
+                self.assertGreater(view['queries'], 0)
+        self.assertEqual(set(result['render']),
+                         {'url_tag_ms', 'attributes_ms', 'speedup'})
+        lines = compare({'runs': [result]}, {'runs': [result]})
+        self.assertEqual(len(lines), len(result['views']))
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.get(author=user)
+        for field, value in expected.items():
+            with self.subTest(user=user, field=field):
+                self.assertEqual(getattr(stats, field),
+                                 value,
+                                 f'Счётчик {field} неверный')
+
+    def test_counters_follow_changes(self):
+        """Проверяем, что счётчики меняются вместе с данными."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        comment = Comment.objects.create(post=post,
+                                         author=self.follower,
+                                         text='Комментарий')
+        follow = Follow.objects.create(user=self.follower,
+                                       author=self.author)
+        self.assertStats(self.author, posts_count=2, followers_count=1)
+        self.assertStats(self.follower, following_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1,
+                         'Счётчик комментариев не увеличился')
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0,
+                         'Счётчик комментариев не уменьшился')
+        self.assertStats(self.author, posts_count=2, followers_count=0)
+        self.assertStats(self.follower, following_count=0)
+
+    def test_edit_does_not_overwrite_counter(self):
+        """Проверяем, что сохранение устаревшего экземпляра поста
+        не затирает счётчик комментариев."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post,
+                               author=self.follower,
+                               text='Комментарий')
+        stale.text = 'Отредактированный пост'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1,
+                         'Редактирование затёрло счётчик комментариев')
+
+    def test_delete_user_with_content(self):
+        """Проверяем, что пользователь с постами, комментариями
+        и подписками удаляется, а счётчики остальных уменьшаются."""
+        user = User.objects.create_user(username='test_deleted')
+        post = Post.objects.create(text='Пост', author=user)
+        Comment.objects.create(post=post, author=self.follower,
+                               text='Комментарий')
+        Comment.objects.create(post=post, author=user, text='Ответ')
+        Follow.objects.create(user=self.follower, author=user)
+        Follow.objects.create(user=user, author=self.author)
+        user.delete()
+        self.assertFalse(AuthorStats.objects.filter(
+            author_id=user.pk).exists(), 'Счётчики удалённого воссозданы')
+        self.assertStats(self.author, followers_count=0)
+        self.assertStats(self.follower, following_count=0)
+
+    def test_recount_stats_repairs_drift(self):
+        """Проверяем, что команда recount_stats исправляет счётчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post,
+                               author=self.follower,
+                               text='Комментарий')
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.update(posts_count=42, followers_count=42)
+        Post.objects.update(comments_count=42)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.follower, posts_count=0, following_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1,
+                         'Счётчик комментариев не пересчитан')
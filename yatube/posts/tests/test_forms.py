@@ -1,12 +1,16 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import images
+from ..forms import PostForm
 from ..models import Group, Post, Comment
 
 User = get_user_model()
@@ -134,3 +138,117 @@ class PostFormTests(TestCase):
         self.assertTrue(Comment.objects.filter(
             text='Тестовый комментарий'
         ).exists())
+
+
+def image_upload(name='photo.jpg', size=(40, 20), orientation=None,
+                 image_format='JPEG'):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x010f] = 'Телефон'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    # TIFF берёт теги из tiffinfo, остальные форматы — из exif.
+    image.save(buffer, image_format, exif=exif.tobytes(), tiffinfo=exif)
+    return SimpleUploadedFile(name=name,
+                              content=buffer.getvalue(),
+                              content_type=Image.MIME[image_format])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageNormalizationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+
+    def create_post(self, image):
+        form = PostForm({'text': 'Пост с фото'}, {'image': image},
+                        instance=Post(author=self.test_user))
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_exif_stripped_and_rotated(self):
+        """Проверяем, что картинка поворачивается по EXIF,
+        а метаданные удаляются."""
+        uploads = {
+            'JPEG': image_upload(orientation=6),
+            'PNG': image_upload('photo.png', orientation=6,
+                                image_format='PNG'),
+            'TIFF': image_upload('photo.tiff', orientation=6,
+                                 image_format='TIFF'),
+        }
+        for image_format, upload in uploads.items():
+            with self.subTest(image_format=image_format):
+                post = self.create_post(upload)
+                with Image.open(post.image.path) as image:
+                    self.assertEqual(image.size, (20, 40),
+                                     'Картинка не повёрнута по EXIF')
+                    self.assertEqual(len(image.getexif()), 0,
+                                     'EXIF не удалён')
+                    self.assertNotIn('exif', image.info, 'EXIF не удалён')
+                self.assertEqual((post.image_width, post.image_height),
+                                 (20, 40))
+        self.assertTrue(post.image.name.endswith('.png'),
+                        'TIFF не пересжат в PNG')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=10)
+    def test_large_image_downscaled(self):
+        """Проверяем, что большая картинка уменьшается
+        до POST_IMAGE_MAX_SIDE."""
+        post = self.create_post(image_upload())
+        self.assertEqual((post.image_width, post.image_height), (10, 5))
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_large_file_rejected(self):
+        """Проверяем, что файл больше POST_IMAGE_MAX_BYTES
+        не принимается."""
+        form = PostForm({'text': 'Пост с фото'},
+                        {'image': image_upload()},
+                        instance=Post(author=self.test_user))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_duplicate_reuses_file(self):
+        """Проверяем, что одинаковые картинки хранятся одним файлом."""
+        first = self.create_post(image_upload())
+        second = self.create_post(image_upload(name='copy.jpg'))
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_hash, first.image_hash)
+        self.assertEqual(second.image_width, first.image_width)
+
+    def test_truncated_image_rejected(self):
+        """Проверяем, что обрезанный JPEG отклоняется формой,
+        а не роняет запрос."""
+        content = image_upload(size=(400, 400)).read()
+        image = SimpleUploadedFile(name='broken.jpg',
+                                   content=content[:len(content) // 2],
+                                   content_type='image/jpeg')
+        form = PostForm({'text': 'Пост с фото'}, {'image': image},
+                        instance=Post(author=self.test_user))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1000)
+    def test_upload_stopped_at_size_limit(self):
+        """Проверяем, что приём файла больше POST_IMAGE_MAX_BYTES
+        обрывается, а форма отвечает ошибкой размера."""
+        handler = images.SizeLimitUploadHandler()
+        handler.new_file('image', 'big.jpg', 'image/jpeg', None)
+        self.assertEqual(handler.receive_data_chunk(b'x' * 800, 0),
+                         b'x' * 800)
+        self.assertIsNone(handler.receive_data_chunk(b'x' * 800, 800),
+                          'Файл принимается дальше лимита')
+        self.assertIsInstance(handler.file_complete(1600),
+                              images.OversizedUpload)
+        client = Client()
+        client.force_login(self.test_user)
+        response = client.post(
+            reverse('posts:post_create'),
+            {'text': 'Большая картинка',
+             'image': SimpleUploadedFile('big.jpg', b'x' * 5000,
+                                         content_type='image/jpeg')})
+        self.assertIn('Файл больше',
+                      ' '.join(response.context['form'].errors['image']))
+        self.assertFalse(Post.objects.filter(
+            text='Большая картинка').exists())
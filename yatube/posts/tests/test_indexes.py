@@ -0,0 +1,96 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..utils import NEXT, NUMBER_OF_POSTS, CursorPaginator
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы лент должны идти по индексам, без полного
+    просмотра таблиц и сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test_slug',
+                                         description='Тестовое описание')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author,
+                                       group=cls.group)
+        Comment.objects.create(post=cls.post,
+                               author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexed(self, sql, params=(), allow_sort=False):
+        for detail in self.plan(sql, params):
+            self.assertFalse(
+                detail.startswith('SCAN') and ' USING ' not in detail,
+                f'Полный просмотр таблицы: {detail}\n{sql}')
+            if not allow_sort:
+                self.assertNotIn('USE TEMP B-TREE', detail,
+                                 f'Сортировка без индекса\n{sql}')
+
+    def test_views_use_indexes(self):
+        """Проверяем планы всех запросов страниц лент и поста."""
+        cursor = CursorPaginator(Post.objects.all(),
+                                 NUMBER_OF_POSTS).encode_cursor(self.post,
+                                                                NEXT)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + f'?cursor={cursor}',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:api_post_detail',
+                    kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.authorized_client.get(url)
+            for query in context.captured_queries:
+                with self.subTest(url=url, sql=query['sql']):
+                    self.assertIndexed(query['sql'])
+
+    def test_follow_feed_uses_indexes(self):
+        """Проверяем, что записи ленты читаются по индексу без
+        сортировки. Сортируются только посты популярных авторов:
+        их немного, а лента целиком не сортируется никогда."""
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(reverse('posts:follow_index'))
+        for query in context.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertIndexed(
+                    query['sql'],
+                    allow_sort='posts_authorstats' in query['sql'])
+
+    def test_followers_lookup_uses_index(self):
+        """Проверяем, что подписчики автора ищутся по индексу
+        (author, user)."""
+        sql, params = Follow.objects.filter(
+            author=self.author).values_list('user_id').query.sql_with_params()
+        self.assertIn('USING COVERING INDEX follow_author_user_idx',
+                      ' '.join(self.plan(sql, params)))
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+COUNT_AUTHORS = 5
+
+
+class PostViewsQueriesTest(TestCase):
+    """Количество SQL-запросов не должно зависеть от числа постов,
+    авторов, групп и комментариев на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = []
+        for i in range(COUNT_AUTHORS):
+            author = User.objects.create_user(username=f'author_{i}',
+                                              first_name=f'Имя {i}',
+                                              last_name=f'Фамилия {i}')
+            group = Group.objects.create(title=f'Группа {i}',
+                                         slug=f'group_{i}',
+                                         description='Описание')
+            Follow.objects.create(user=cls.reader, author=author)
+            cls.authors.append(author)
+            cls.group = group
+            for j in range(2):
+                Post.objects.create(text=f'Пост {i}-{j}',
+                                    author=author,
+                                    group=group)
+        cls.post = Post.objects.create(text='Пост с комментариями',
+                                       author=cls.authors[0],
+                                       group=cls.group)
+        for author in cls.authors:
+            Comment.objects.create(post=cls.post,
+                                   author=author,
+                                   text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_guest_views_number_of_queries(self):
+        """Проверяем количество запросов на страницах для гостя."""
+        urls_queries = {
+            # посты
+            reverse('posts:index'): 1,
+            # группа для версии, посты
+            reverse('posts:group_list',
+                    kwargs={'slug': self.group.slug}): 2,
+            # ETag, автор со счётчиками, посты
+            reverse('posts:profile',
+                    kwargs={'username': self.authors[0]}): 3,
+            # ETag, пост с автором и счётчиками, комментарии
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.post.id}): 3,
+        }
+        for address, queries in urls_queries.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    self.guest_client.get(address)
+
+    def test_authorized_views_number_of_queries(self):
+        """Проверяем количество запросов на страницах
+        для авторизованного пользователя."""
+        urls_queries = {
+            # сессия, пользователь, посты
+            reverse('posts:index'): 3,
+            # сессия, пользователь, ETag, автор со счётчиками, подписка,
+            # посты
+            reverse('posts:profile',
+                    kwargs={'username': self.authors[0]}): 6,
+            # сессия, пользователь, записи ленты, посты популярных
+            # авторов, посты страницы
+            reverse('posts:follow_index'): 5,
+        }
+        for address, queries in urls_queries.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    self.authorized_client.get(address)
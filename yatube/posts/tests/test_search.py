@@ -0,0 +1,88 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchResults, get_backend
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+        cls.relevant = Post.objects.create(
+            text='Котики, котики и ещё раз котики',
+            author=cls.test_user
+        )
+        cls.less_relevant = Post.objects.create(
+            text='Длинный пост про собак, в конце которого есть котики, '
+                 'а ещё про погоду, про море и про горы',
+            author=cls.test_user
+        )
+        cls.other = Post.objects.create(
+            text='Пост про собак',
+            author=cls.test_user
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        return list(SearchResults(query)[0:10])
+
+    def test_search_ranked(self):
+        """Проверяем, что поиск находит посты и ранжирует их."""
+        results = self.search('котики')
+        self.assertEqual(results,
+                         [self.relevant, self.less_relevant],
+                         'Поиск нашёл неверные посты')
+
+    def test_index_follows_changes(self):
+        """Проверяем, что индекс обновляется при изменении
+        и удалении поста."""
+        post = Post.objects.create(text='Уникальное слово',
+                                   author=self.test_user)
+        self.assertEqual(self.search('уникальное'), [post])
+        post.text = 'Другое слово'
+        post.save()
+        self.assertEqual(self.search('уникальное'), [],
+                         'Индекс не обновился после редактирования')
+        post.delete()
+        self.assertEqual(self.search('другое'), [],
+                         'Индекс не обновился после удаления')
+
+    def test_search_page(self):
+        """Проверяем, что страница поиска отдаёт найденные посты."""
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'собак'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(set(response.context['page_obj']),
+                         {self.less_relevant, self.other},
+                         'Страница поиска отдаёт неверные посты')
+
+    def test_search_special_characters(self):
+        """Проверяем, что спецсимволы запроса не ломают поиск."""
+        for query in ('"', 'AND OR NOT', '*котики*', '(', '   '):
+            with self.subTest(query=query):
+                response = self.guest_client.get(reverse('posts:search'),
+                                                 {'q': query})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_rebuild_search_index(self):
+        """Проверяем, что команда перестраивает индекс."""
+        get_backend().clear()
+        if connection.vendor in ('sqlite', 'postgresql'):
+            self.assertEqual(self.search('котики'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('котики'),
+                         [self.relevant, self.less_relevant],
+                         'Индекс не перестроен')
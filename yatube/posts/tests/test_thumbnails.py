@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from .. import tasks, thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.test_user,
+            image=SimpleUploadedFile(name='small.gif',
+                                     content=small_gif,
+                                     content_type='image/gif')
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_placeholder_until_generated(self):
+        """Проверяем, что до создания миниатюры страница отдаёт
+        заглушку, а после — картинку."""
+        self.assertIsNone(
+            thumbnails.backend.get_cached_thumbnail(
+                self.post.image, '960x339', upscale=True),
+            'Миниатюра создана внутри запроса'
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'aria-busy="true"')
+        self.assertNotContains(response, '<img class="card-img')
+        thumbnails.generate(self.post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'aria-busy="true"')
+        self.assertContains(response, '<img class="card-img')
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_responsive_markup(self):
+        """Проверяем, что карточка отдаёт srcset, sizes, ленивую
+        загрузку и размеры исходной картинки."""
+        self.assertEqual((self.post.image_width, self.post.image_height),
+                         (2, 1), 'Размеры картинки не сохранены')
+        thumbnails.generate(self.post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        for attribute in ('srcset="', 'sizes="', 'loading="lazy"'):
+            with self.subTest(attribute=attribute):
+                self.assertContains(response, attribute)
+
+    def test_image_set_variants(self):
+        """Проверяем, что маленькая картинка не увеличивается и её
+        варианты одной ширины не дублируются в srcset."""
+        thumbnails.generate(self.post.image.name)
+        images = thumbnails.image_set(self.post.image)
+        self.assertEqual(images['width'], 2)
+        self.assertEqual(images['srcset'].count(','), 0)
+        self.assertEqual([source['type'] for source in images['sources']],
+                         [thumbnails.MIME_TYPES[image_format]
+                          for image_format in thumbnails.image_formats()])
+
+    def test_generate_all_presets(self):
+        """Проверяем, что создаются миниатюры всех размеров
+        и форматов."""
+        thumbnails.generate(self.post.image.name)
+        for geometry, options in thumbnails.presets():
+            with self.subTest(geometry=geometry, options=options):
+                thumbnail = thumbnails.backend.get_cached_thumbnail(
+                    self.post.image, geometry, **options)
+                self.assertIsNotNone(thumbnail, 'Миниатюра не создана')
+                self.assertTrue(thumbnail.exists())
+
+    def test_eager_mode_uses_thread_pool(self):
+        """Проверяем, что без воркера миниатюры передаются пулу
+        потоков, а с воркером — в очередь задач."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule, \
+                mock.patch.object(tasks.generate_thumbnails,
+                                  'delay') as delay:
+            with override_settings(TASKS_ALWAYS_EAGER=True):
+                self.post.save()
+            schedule.assert_called_once_with(self.post.image.name)
+            delay.assert_not_called()
+            with override_settings(TASKS_ALWAYS_EAGER=False):
+                self.post.save()
+            schedule.assert_called_once()
+            delay.assert_called_once()
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import TimelinePaginator, timeline_posts
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+        cls.another = User.objects.create_user(username='another')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Проверяем, что после подписки в ленту попадают
+        уже опубликованные посты автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.follower,
+                                         post=self.old_post).exists(),
+            'Лента не заполнилась после подписки'
+        )
+
+    def test_new_post_fans_out(self):
+        """Проверяем, что новый пост раскладывается только
+        по лентам подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertIn(post, timeline_posts(self.follower),
+                      'Пост не попал в ленту подписчика')
+        self.assertNotIn(post, timeline_posts(self.another),
+                         'Пост попал в ленту того, кто не подписан')
+
+    def test_unfollow_prunes_timeline(self):
+        """Проверяем, что после отписки посты автора
+        пропадают из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.filter(user=self.follower,
+                              author=self.author).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists(),
+            'Лента не очистилась после отписки'
+        )
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+    def test_celebrity_fan_out_on_read(self):
+        """Проверяем, что посты популярного автора не раскладываются
+        по лентам, но видны подписчикам при чтении."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.another, author=self.author)
+        post = Post.objects.create(text='Пост знаменитости',
+                                   author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists(),
+            'Пост популярного автора разложен по лентам'
+        )
+        for user in (self.follower, self.another):
+            with self.subTest(user=user):
+                self.assertIn(post, timeline_posts(user),
+                              'Пост популярного автора не виден в ленте')
+        self.assertEqual(timeline_posts(self.follower).count(),
+                         2,
+                         'Посты в ленте дублируются')
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+    def test_paginator_merges_timeline_and_celebrities(self):
+        """Проверяем, что курсорные страницы ленты объединяют записи
+        ленты и посты популярного автора без пропусков и повторов."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.another, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.another)
+        for number in range(3):
+            Post.objects.create(text=f'Знаменитость {number}',
+                                author=self.author)
+            Post.objects.create(text=f'Обычный {number}',
+                                author=self.another)
+        expected = list(timeline_posts(self.follower).order_by(
+            '-pub_date', '-pk'))
+        paginator = TimelinePaginator(self.follower, 3)
+        page = paginator.page()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, expected,
+                         'Страницы ленты не совпадают с лентой')
+        previous = paginator.page(page.previous_cursor)
+        self.assertEqual(list(previous), expected[3:6],
+                         'Предыдущая страница ленты собрана неверно')
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+    def test_leaving_celebrities_refills_timelines(self):
+        """Проверяем, что посты автора, опустившегося ниже порога
+        популярности, раскладываются по лентам подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.another, author=self.author)
+        post = Post.objects.create(text='Пост знаменитости',
+                                   author=self.author)
+        Follow.objects.filter(user=self.another,
+                              author=self.author).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.follower,
+                                         post=post).exists(),
+            'Посты бывшей знаменитости не разложены по лентам')
+        self.assertIn(post, TimelinePaginator(self.follower, 10).page(),
+                      'Пост бывшей знаменитости пропал из ленты')
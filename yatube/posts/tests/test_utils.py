@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..utils import CursorPaginator, NUMBER_OF_POSTS
+
+User = get_user_model()
+COUNT_POSTS_TEST = 25
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for i in range(COUNT_POSTS_TEST):
+            Post.objects.create(
+                text=f'Some post text №{i}',
+                author=cls.test_user,
+                group=cls.group
+            )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.paginator = CursorPaginator(Post.objects.all(), NUMBER_OF_POSTS)
+
+    def test_walk_forward_and_back(self):
+        """Проверяем, что курсоры проходят ленту вперёд и назад
+        без пропусков и повторов."""
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(
+            list(first) + list(second) + list(third),
+            self.expected,
+            'Курсорная пагинация теряет или дублирует посты'
+        )
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        back = self.paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second),
+                         'Курсор на предыдущую страницу работает неверно')
+        self.assertEqual(
+            list(self.paginator.get_page(second.previous_cursor)),
+            list(first),
+            'Возврат на первую страницу работает неверно'
+        )
+
+    def test_last_page(self):
+        """Проверяем, что курсор на последнюю страницу отдаёт хвост ленты."""
+        last = self.paginator.get_page(
+            self.paginator.get_page().last_cursor)
+        self.assertEqual(list(last),
+                         self.expected[-NUMBER_OF_POSTS:],
+                         'Последняя страница сформирована неверно')
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+    def test_invalid_cursor(self):
+        """Проверяем, что битый курсор приводит на первую страницу."""
+        for cursor in ('garbage', 'eyJkIjoieCJ9', '%%%'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(
+                    list(self.paginator.get_page(cursor)),
+                    self.expected[:NUMBER_OF_POSTS],
+                    'Битый курсор обрабатывается неверно'
+                )
+
+    def test_approximate_count(self):
+        """Проверяем, что примерное количество записей считается
+        только по запросу и кешируется."""
+        self.assertIsNone(self.paginator.get_page().approximate_count)
+        paginator = CursorPaginator(Post.objects.all(), NUMBER_OF_POSTS,
+                                    with_total=True)
+        page = paginator.get_page()
+        self.assertEqual(page.approximate_count, COUNT_POSTS_TEST)
+        with self.assertNumQueries(0):
+            self.assertEqual(page.approximate_count, COUNT_POSTS_TEST)
+
+    def test_cursor_links_on_pages(self):
+        """Проверяем, что страницы лент отдают ссылки с курсором."""
+        client = Client()
+        url_names = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.test_user}),
+        ]
+        for address in url_names:
+            with self.subTest(address=address):
+                page_obj = client.get(address).context['page_obj']
+                self.assertContains(client.get(address),
+                                    f'?cursor={page_obj.next_cursor}')
+                next_page = client.get(
+                    address, {'cursor': page_obj.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    list(next_page),
+                    self.expected[NUMBER_OF_POSTS:2 * NUMBER_OF_POSTS],
+                    'Вторая страница по курсору сформирована неверно'
+                )
@@ -9,8 +9,9 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 
-from ..models import Group, Post, Follow
-from ..utils import NUMBER_OF_POSTS
+from .. import versions
+from ..models import Comment, Group, Post, Follow
+from ..utils import NUMBER_OF_COMMENTS, NUMBER_OF_POSTS
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -221,7 +222,7 @@ class PostPagesTests(TestCase):
         )
         post_on_page = PostPagesTests.test_client.get(
             reverse('posts:index')).content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Изменён в обход ORM')
         post_in_cache = PostPagesTests.test_client.get(
             reverse('posts:index')).content
         self.assertEqual(post_on_page,
@@ -235,6 +236,47 @@ class PostPagesTests(TestCase):
                             post_not_on_page,
                             'Пост остаётся на странице после очистки кеша')
 
+    def test_cache_invalidated_by_signals(self):
+        """Проверяем, что создание и удаление поста сбрасывает кеш
+        только затронутых лент."""
+        another_user = User.objects.create_user(username='another_user')
+        pages = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list',
+                             kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.test_user}),
+            'another_profile': reverse('posts:profile',
+                                       kwargs={'username': another_user}),
+        }
+        before = {name: PostPagesTests.test_client.get(url).content
+                  for name, url in pages.items()}
+        post = Post.objects.create(
+            text='Пост для сброса кеша',
+            author=self.test_user,
+            group=self.group
+        )
+        after = {name: PostPagesTests.test_client.get(url).content
+                 for name, url in pages.items()}
+        for name in ('index', 'group', 'profile'):
+            with self.subTest(page=name):
+                self.assertNotEqual(before[name], after[name],
+                                    'Кеш ленты не сброшен новым постом')
+                self.assertContains(
+                    PostPagesTests.test_client.get(pages[name]),
+                    'Пост для сброса кеша'
+                )
+        self.assertEqual(before['another_profile'],
+                         after['another_profile'],
+                         'Сброшен кеш незатронутой ленты')
+        post.delete()
+        for name in ('index', 'group', 'profile'):
+            with self.subTest(page=name):
+                self.assertNotContains(
+                    PostPagesTests.test_client.get(pages[name]),
+                    'Пост для сброса кеша'
+                )
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -378,3 +420,146 @@ class FollowViewsTest(TestCase):
             response.context['page_obj'].object_list,
             'Пост появляется на странице не подписанного пользователя'
         )
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        self.urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ]
+
+    def test_not_modified(self):
+        """Проверяем, что страница поста и профиль отвечают 304
+        без запросов за данными, пока ничего не изменилось."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                with self.assertNumQueries(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes(self):
+        """Проверяем, что ETag меняется после нового комментария
+        и различается для гостя и пользователя."""
+        url = self.urls[0]
+        etag = self.guest_client.get(url)['ETag']
+        response = self.authorized_client.get(url)
+        self.assertNotEqual(response['ETag'], etag,
+                            'Гость и пользователь получили один ETag')
+        self.assertIn('private', response['Cache-Control'])
+        Comment.objects.create(post=self.post,
+                               author=self.author,
+                               text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200,
+                         'Страница не обновилась после комментария')
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author)
+        for i in range(NUMBER_OF_COMMENTS + 5):
+            Comment.objects.create(post=cls.post,
+                                   author=cls.author,
+                                   text=f'Комментарий №{i}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_comments_paginated(self):
+        """Проверяем, что на странице поста только первая страница
+        комментариев, а остальные отдаются отдельным запросом."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), NUMBER_OF_COMMENTS)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-more-comments')
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk}),
+                {'cursor': comments.next_cursor})
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertContains(response, 'Комментарий №0')
+        self.assertNotContains(response, 'data-more-comments')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author',
+                                              first_name='Иван')
+        cls.post = Post.objects.create(text='Тестовый пост',
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_index(self):
+        # Новая версия ленты сбрасывает кеш страницы, но не карточек.
+        versions.bump('index')
+        return self.guest_client.get(reverse('posts:index'))
+
+    def test_cards_reused_until_post_changes(self):
+        """Проверяем, что пересобранная лента берёт карточку из кеша,
+        а изменение поста или имени автора её обновляет."""
+        self.get_index()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertContains(self.get_index(), 'Тестовый пост',
+                            msg_prefix='Карточка не взята из кеша')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertContains(self.get_index(), 'Отредактированный пост',
+                            msg_prefix='Карточка не обновилась')
+        self.author.first_name = 'Пётр'
+        self.author.save()
+        self.assertContains(self.get_index(), 'Пётр',
+                            msg_prefix='Имя автора не обновилось')
+
+    def test_renames_invalidate_cached_pages(self):
+        """Проверяем, что смена username автора и slug группы
+        обновляет ссылки в уже закешированных страницах."""
+        group = Group.objects.create(title='Группа', slug='old_slug')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        versions.bump('index')
+        pages = (reverse('posts:index'),
+                 reverse('posts:post_detail', args=[self.post.pk]))
+        for page in pages:
+            self.guest_client.get(page)
+        self.author.username = 'renamed_author'
+        self.author.save()
+        group.slug = 'new_slug'
+        group.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertContains(
+                    response, reverse('posts:profile',
+                                      args=['renamed_author']))
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')),
+            reverse('posts:group_list', args=['new_slug']))
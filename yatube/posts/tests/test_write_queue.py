@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import write_queue
+from ..models import AuthorStats, Comment, Follow, Post
+from ..write_queue import WriteQueue
+
+User = get_user_model()
+
+
+class WriteQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'journal.ndjson')
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.queue = self.make_queue()
+
+    def make_queue(self):
+        return WriteQueue(self.journal, 0.05, 500, autostart=False)
+
+    def journal_lines(self):
+        with open(self.journal, encoding='utf-8') as file:
+            return [line for line in file if line.strip()]
+
+    def test_enqueue_writes_journal_before_database(self):
+        """Проверяем, что запись сначала попадает в журнал,
+        а в базу — только при сбросе очереди."""
+        self.queue.enqueue({'model': 'comment',
+                            'post_id': self.post.pk,
+                            'author_id': self.follower.pk,
+                            'text': 'Комментарий'})
+        self.assertEqual(len(self.journal_lines()), 1,
+                         'Запись не попала в журнал')
+        self.assertFalse(Comment.objects.exists(),
+                         'Комментарий записан до сброса очереди')
+        self.assertEqual(self.queue.flush(), 1)
+        self.assertTrue(Comment.objects.filter(post=self.post).exists(),
+                        'Комментарий не записан при сбросе')
+        self.assertEqual(self.journal_lines(), [],
+                         'Журнал не очищен после записи')
+
+    def test_flush_batches_and_sends_signals(self):
+        """Проверяем, что пакет пишется одной транзакцией, дубли
+        подписок отбрасываются, а счётчики обновляются сигналами."""
+        for text in ('Первый', 'Второй'):
+            self.queue.enqueue({'model': 'comment',
+                                'post_id': self.post.pk,
+                                'author_id': self.follower.pk,
+                                'text': text})
+        for _ in range(2):
+            self.queue.enqueue({'model': 'follow',
+                                'user_id': self.follower.pk,
+                                'author_id': self.author.pk})
+        self.queue.enqueue({'model': 'follow',
+                            'user_id': self.author.pk,
+                            'author_id': self.author.pk})
+        self.queue.flush()
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 2)
+        self.assertEqual(Follow.objects.count(), 1,
+                         'Дубли и подписка на себя не отброшены')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2,
+                         'Счётчик комментариев не обновлён')
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 1,
+            'Счётчик подписчиков не обновлён')
+
+    def test_journal_is_replayed_after_restart(self):
+        """Проверяем, что незаписанные строки журнала подхватываются
+        новой очередью."""
+        self.queue.enqueue({'model': 'follow',
+                            'user_id': self.follower.pk,
+                            'author_id': self.author.pk})
+        restarted = self.make_queue()
+        self.assertEqual(len(restarted), 1,
+                         'Журнал не прочитан при старте')
+        restarted.flush()
+        self.assertTrue(Follow.objects.filter(user=self.follower,
+                                              author=self.author).exists())
+
+    def test_views_use_queue_when_enabled(self):
+        """Проверяем, что при WRITE_BEHIND_ENABLED представления
+        ставят запись в очередь и сразу отвечают редиректом."""
+        client = Client()
+        client.force_login(self.follower)
+        with override_settings(WRITE_BEHIND_ENABLED=True), \
+                mock.patch.object(write_queue, '_queue', self.queue):
+            response = client.post(
+                reverse('posts:add_comment', args=[self.post.pk]),
+                {'text': 'Из очереди'})
+            client.get(reverse('posts:profile_follow',
+                               args=[self.author.username]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(self.queue), 2)
+        self.assertFalse(Comment.objects.exists())
+        self.queue.flush()
+        self.assertTrue(Comment.objects.filter(text='Из очереди').exists())
+        self.assertTrue(Follow.objects.filter(user=self.follower,
+                                              author=self.author).exists())
+
+    def test_process_journals_are_independent(self):
+        """Проверяем, что сброс одной очереди не теряет записи
+        очереди другого процесса."""
+        base = os.path.join(self.directory, 'shared.ndjson')
+        first = WriteQueue(f'{base}.1', 0.05, 500, autostart=False)
+        second = WriteQueue(f'{base}.2', 0.05, 500, autostart=False)
+        first.enqueue({'model': 'comment',
+                       'post_id': self.post.pk,
+                       'author_id': self.follower.pk,
+                       'text': 'Первый процесс'})
+        second.enqueue({'model': 'follow',
+                        'user_id': self.follower.pk,
+                        'author_id': self.author.pk})
+        second.flush()
+        self.assertEqual(len(WriteQueue(f'{base}.1', 0.05, 500,
+                                        autostart=False)), 1,
+                         'Сброс второй очереди стёр журнал первой')
+
+    def test_orphan_journals_are_adopted_once(self):
+        """Проверяем, что журнал завершившегося процесса забирает
+        только один новый процесс."""
+        base = os.path.join(self.directory, 'shared.ndjson')
+        WriteQueue(f'{base}.1', 0.05, 500, autostart=False).enqueue(
+            {'model': 'comment',
+             'post_id': self.post.pk,
+             'author_id': self.follower.pk,
+             'text': 'Осиротевший'})
+        WriteQueue(f'{base}.2', 0.05, 500, autostart=False).enqueue(
+            {'model': 'follow',
+             'user_id': self.follower.pk,
+             'author_id': self.author.pk})
+
+        def is_alive(pid):
+            return pid != 1
+
+        write_queue.adopt_orphans(base, f'{base}.3', is_alive)
+        write_queue.adopt_orphans(base, f'{base}.4', is_alive)
+        adopted = WriteQueue(f'{base}.3', 0.05, 500, autostart=False)
+        self.assertEqual(len(adopted), 1,
+                         'Журнал завершившегося процесса не подхвачен')
+        self.assertEqual(
+            len(WriteQueue(f'{base}.4', 0.05, 500, autostart=False)), 0,
+            'Журнал подхвачен дважды')
+        self.assertTrue(os.path.exists(f'{base}.2'),
+                        'Забран журнал живого процесса')
+        adopted.flush()
+        self.assertEqual(Comment.objects.filter(text='Осиротевший').count(),
+                         1)
+
+    def test_records_of_deleted_users_skipped(self):
+        """Проверяем, что запись удалённого пользователя не мешает
+        записать остальные."""
+        ghost = User.objects.create_user(username='ghost')
+        for author in (ghost, self.follower):
+            self.queue.enqueue({'model': 'comment',
+                                'post_id': self.post.pk,
+                                'author_id': author.pk,
+                                'text': f'От {author.username}'})
+        self.queue.enqueue({'model': 'follow',
+                            'user_id': ghost.pk,
+                            'author_id': self.author.pk})
+        ghost.delete()
+        self.assertEqual(self.queue.flush(), 3)
+        self.assertEqual(list(Comment.objects.values_list('text',
+                                                          flat=True)),
+                         ['От test_follower'])
+        self.assertFalse(Follow.objects.exists())
+
+    def test_failing_record_dropped(self):
+        """Проверяем, что запись, которую база не принимает,
+        отбрасывается, а остальные записываются."""
+        self.queue.enqueue({'model': 'comment',
+                            'post_id': self.post.pk,
+                            'author_id': self.follower.pk,
+                            'text': None})
+        self.queue.enqueue({'model': 'comment',
+                            'post_id': self.post.pk,
+                            'author_id': self.follower.pk,
+                            'text': 'Нормальный'})
+        with self.assertLogs('posts.write_queue', 'ERROR'):
+            self.assertEqual(self.queue.flush(), 2)
+        self.assertEqual(len(self.queue), 0, 'Битая запись осталась')
+        self.assertEqual(self.journal_lines(), [])
+        self.assertTrue(Comment.objects.filter(text='Нормальный').exists())
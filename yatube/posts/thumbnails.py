@@ -0,0 +1,189 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Для каждой ширины из POST_IMAGE_WIDTHS создаётся миниатюра в формате
+по умолчанию и в современных форматах из POST_IMAGE_FORMATS, которые
+умеет сохранять установленный Pillow. Шаблоны только читают готовые
+миниатюры из key-value хранилища sorl-thumbnail (image_set) и никогда
+не ресайзят картинку внутри запроса.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.db import close_old_connections, transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import versions
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+    'AVIF': 'image/avif',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который умеет искать готовую миниатюру,
+    не создавая её."""
+
+    def _options(self, source, options):
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options))
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PostThumbnailBackend()
+
+
+def image_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [image_format for image_format in settings.POST_IMAGE_FORMATS
+            if image_format in Image.SAVE]
+
+
+def geometry(width):
+    box_width, box_height = settings.POST_IMAGE_BOX
+    return f'{width}x{round(width * box_height / box_width)}'
+
+
+def presets():
+    """Пары (геометрия, опции) всех миниатюр картинки поста."""
+    return [
+        (geometry(width), {'upscale': False,
+                           **({'format': image_format}
+                              if image_format else {})})
+        for image_format in (None, *image_formats())
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def _srcset(thumbnails):
+    return ', '.join(f'{thumbnail.url} {width}w'
+                     for width, thumbnail in sorted(thumbnails.items()))
+
+
+def image_set(file_):
+    """Варианты картинки для <picture> или None, если миниатюры ещё
+    создаются.
+
+    Маленькие картинки не увеличиваются, поэтому варианты одной ширины
+    схлопываются, а дескрипторы srcset берутся из настоящей ширины."""
+    if not file_:
+        return None
+    variants = {}
+    for preset_geometry, options in presets():
+        thumbnail = backend.get_cached_thumbnail(file_, preset_geometry,
+                                                 **options)
+        if thumbnail is None:
+            schedule(getattr(file_, 'name', file_))
+            return None
+        variants.setdefault(options.get('format'), {}).setdefault(
+            thumbnail.width, thumbnail)
+    fallback = variants.pop(None)
+    largest = fallback[max(fallback)]
+    return {
+        'src': largest.url,
+        'width': largest.width,
+        'height': largest.height,
+        'srcset': _srcset(fallback),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': _srcset(thumbnails)}
+            for image_format, thumbnails in variants.items()
+        ],
+    }
+
+
+def create(name):
+    """Создаёт все миниатюры картинки."""
+    for preset_geometry, options in presets():
+        backend.get_thumbnail(name, preset_geometry, **options)
+    # Размеры картинок, которые попали в базу без загрузки через форму.
+    posts = Post.objects.filter(image=name)
+    if posts.filter(image_width__isnull=True).exists():
+        with default.storage.open(name) as file:
+            width, height = get_image_dimensions(file)
+        posts.update(image_width=width, image_height=height)
+    # В кешированных лентах и карточках вместо картинки стоит заглушка.
+    for post in posts:
+        versions.bump(*versions.post_feeds(post),
+                      *versions.follower_feeds(post.author_id),
+                      f'post-card:{post.pk}')
+
+
+def generate(name):
+    """Создаёт миниатюры в пуле потоков, ошибки только логируются."""
+    try:
+        create(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        _pending.discard(name)
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def _submit(name):
+    if name in _pending:
+        return
+    _pending.add(name)
+    get_executor().submit(generate, name)
+
+
+def schedule(name):
+    """Ставит генерацию миниатюр в очередь после коммита транзакции."""
+    if name:
+        transaction.on_commit(lambda: _submit(name))
+
+
+def get_thumbnail(file_, geometry_string, **options):
+    """Неблокирующий поиск миниатюры: если её ещё нет, ставит
+    генерацию в очередь и возвращает None."""
+    if not file_:
+        return None
+    thumbnail = backend.get_cached_thumbnail(file_, geometry_string,
+                                             **options)
+    if thumbnail is None:
+        schedule(getattr(file_, 'name', file_))
+    return thumbnail
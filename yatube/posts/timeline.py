@@ -0,0 +1,156 @@
+"""Материализованные ленты подписок (fan-out-on-write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+follow_index читает готовую ленту по индексу (user, -pub_date) вместо
+JOIN через Follow. Посты «знаменитостей», у которых подписчиков больше
+TIMELINE_CELEBRITY_THRESHOLD, не раскладываются, а подмешиваются
+при чтении (fan-out-on-read).
+
+TimelinePaginator листает обе части по ключу (pub_date, id) и берёт из
+каждой не больше страницы и одной записи, поэтому стоимость страницы не
+зависит от длины ленты. Пост автора, который стал популярным уже после
+раскладки, есть в обеих частях и показывается один раз. Когда автор
+опускается ниже порога, refill раскладывает его посты по лентам всех
+подписчиков: читать их напрямую больше не будут.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .utils import NEXT, CursorPaginator
+
+ENTRY_ORDERING: tuple = ('-pub_date', '-post_id')
+
+FAN_OUT_BATCH_SIZE: int = 500
+
+
+def is_celebrity(author_id):
+    threshold = settings.TIMELINE_CELEBRITY_THRESHOLD
+    if not threshold:
+        return False
+    return AuthorStats.objects.filter(
+        author_id=author_id, followers_count__gte=threshold
+    ).exists()
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id is None or is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(TimelineEntry(user_id=user_id,
+                                   post=post,
+                                   pub_date=post.pub_date))
+        if len(batch) >= FAN_OUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя последние посты нового автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).only('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for post in posts[:settings.TIMELINE_BACKFILL_SIZE]],
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def celebrity_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются
+    напрямую из таблицы постов."""
+    threshold = settings.TIMELINE_CELEBRITY_THRESHOLD
+    if not threshold:
+        return AuthorStats.objects.none().values('author')
+    return AuthorStats.objects.filter(
+        followers_count__gte=threshold,
+        author__in=Follow.objects.filter(user=user).values('author')
+    ).values('author')
+
+
+def left_celebrities(author_id):
+    """Автор только что опустился ниже порога популярности."""
+    threshold = settings.TIMELINE_CELEBRITY_THRESHOLD
+    if not threshold:
+        return False
+    return AuthorStats.objects.filter(
+        author_id=author_id, followers_count=threshold - 1
+    ).exists()
+
+
+def refill(author_id):
+    """Раскладывает последние посты автора по лентам подписчиков."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя одним запросом.
+
+    Нужен для страниц ?page=N; курсорные страницы строит
+    TimelinePaginator."""
+    entries = TimelineEntry.objects.filter(user=user).values('post')
+    condition = Q(pk__in=entries)
+    if settings.TIMELINE_CELEBRITY_THRESHOLD:
+        condition |= Q(author__in=celebrity_authors(user))
+    return Post.objects.filter(condition)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок без сортировки всей ленты."""
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.feed(), per_page)
+        self.user = user
+
+    def _keys(self, queryset, ordering, values, direction):
+        if values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, direction, ordering))
+        fields = [name.lstrip('-') for name in ordering]
+        if direction != NEXT:
+            ordering = fields
+        return queryset.order_by(*ordering).values_list(
+            *fields)[:self.per_page + 1]
+
+    def rows(self, values, direction):
+        keys = {}
+        entries = TimelineEntry.objects.filter(user=self.user)
+        for pub_date, post_id in self._keys(entries, ENTRY_ORDERING,
+                                            values, direction):
+            keys[post_id] = pub_date
+        if settings.TIMELINE_CELEBRITY_THRESHOLD:
+            posts = Post.objects.filter(
+                author__in=celebrity_authors(self.user))
+            for pub_date, post_id in self._keys(posts, self.ordering,
+                                                values, direction):
+                keys[post_id] = pub_date
+        ids = sorted(keys, key=lambda post_id: (keys[post_id], post_id),
+                     reverse=direction == NEXT)[:self.per_page + 1]
+        posts = self.object_list.in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def rebuild():
+    """Перестраивает все ленты по текущим подпискам."""
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.order_by().values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -12,10 +12,19 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow', views.profile_unfollow,
          name='profile_unfollow'),
+    path('search/', views.search, name='search'),
     path('', views.index, name='index'),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path('api/v1/posts/<int:post_id>/', api.post_detail,
+         name='api_post_detail'),
+    path('api/v1/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/v1/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/v1/follow/', api.follow_index, name='api_follow_index'),
 ]
@@ -1,9 +1,232 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+
+from core.caching import get_or_compute
 
 NUMBER_OF_POSTS: int = 10
+NUMBER_OF_COMMENTS: int = 20
+APPROXIMATE_COUNT_TIMEOUT: int = 60
+FEED_ORDERING: tuple = ('-pub_date', '-pk')
+COMMENTS_ORDERING: tuple = ('-created', '-pk')
+
+NEXT: str = 'n'
+PREVIOUS: str = 'p'
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать."""
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс django.core.paginator.Page там, где это возможно,
+    но вместо номеров страниц отдаёт непрозрачные курсоры.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor, has_next,
+                 has_previous, next_cursor, previous_cursor, last_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.number = None if cursor else 1
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count()
+
 
+class CursorPaginator:
+    """Пагинатор по ключу (keyset): вместо OFFSET фильтрует записи
+    по значениям полей сортировки последней показанной записи.
 
-def pagination_on_page(request, posts_list):
-    paginator = Paginator(posts_list, NUMBER_OF_POSTS)
+    Стоимость любой страницы одинакова и не зависит от её «глубины»,
+    COUNT(*) выполняется только по запросу и кешируется.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING,
+                 with_total=False):
+        self.ordering = tuple(ordering)
+        self.object_list = object_list.order_by(*self.ordering)
+        self.per_page = int(per_page)
+        self.with_total = with_total
+        self.model = object_list.model
+
+    def _field(self, name):
+        name = name.lstrip('-')
+        if name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    def _values(self, obj):
+        values = []
+        for name in self.ordering:
+            value = getattr(obj, name.lstrip('-'))
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def encode_cursor(self, obj, direction):
+        payload = json.dumps(
+            {'d': direction, 'v': self._values(obj)},
+            separators=(',', ':'),
+        )
+        return base64.urlsafe_b64encode(
+            payload.encode()).decode().rstrip('=')
+
+    def last_cursor(self):
+        payload = json.dumps({'d': PREVIOUS, 'v': None})
+        return base64.urlsafe_b64encode(
+            payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            payload = json.loads(
+                base64.urlsafe_b64decode(cursor + padding).decode())
+            direction = payload['d']
+            values = payload['v']
+            if direction not in (NEXT, PREVIOUS):
+                raise InvalidCursor(cursor)
+            if values is None:
+                return direction, None
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            return direction, [
+                self._field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError,
+                TypeError, ValidationError) as error:
+            raise InvalidCursor(cursor) from error
+
+    def _keyset_filter(self, values, direction, ordering=None):
+        ordering = ordering or self.ordering
+        condition = Q()
+        for index, name in enumerate(ordering):
+            descending = name.startswith('-')
+            field = name.lstrip('-')
+            after = descending if direction == NEXT else not descending
+            lookup = f'{field}__lt' if after else f'{field}__gt'
+            branch = Q(**{lookup: values[index]})
+            for previous, value in zip(ordering[:index], values):
+                branch &= Q(**{previous.lstrip('-'): value})
+            condition |= branch
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name.lstrip('-') if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def rows(self, values, direction):
+        """До per_page + 1 записей после курсора в порядке обхода."""
+        queryset = self.object_list
+        if direction == PREVIOUS:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        if values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, direction))
+        return list(queryset[:self.per_page + 1])
+
+    def page(self, cursor=None):
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        rows = self.rows(values, direction)
+        if not rows and values is not None:
+            return self.page()
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next = values is not None
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = values is not None
+        return CursorPage(
+            rows,
+            self,
+            cursor or '',
+            has_next,
+            has_previous,
+            self.encode_cursor(rows[-1], NEXT) if has_next else None,
+            self.encode_cursor(rows[0], PREVIOUS) if has_previous else None,
+            self.last_cursor() if has_next else None,
+        )
+
+    def get_page(self, cursor=None):
+        """Как Paginator.get_page: при битом курсоре отдаёт первую
+        страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def approximate_count(self):
+        if not self.with_total:
+            return None
+        query = str(self.object_list.order_by().query)
+        key = 'approximate-count:' + hashlib.md5(query.encode()).hexdigest()
+        return get_or_compute(key, self.object_list.count,
+                              APPROXIMATE_COUNT_TIMEOUT)
+
+
+def pagination_on_page(request, posts_list, with_total=False,
+                       cursor_paginator=None):
+    """Пагинация ленты.
+
+    По умолчанию используется курсорная пагинация (?cursor=...).
+    Старые ссылки вида ?page=N продолжают работать через Paginator.
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = Paginator(posts_list, NUMBER_OF_POSTS)
+        return paginator.get_page(page_number)
+    paginator = cursor_paginator or CursorPaginator(
+        posts_list, NUMBER_OF_POSTS, with_total=with_total)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def comments_page(request, comments):
+    """Страница комментариев: автор одним запросом с комментариями,
+    следующие страницы подгружаются по курсору."""
+    paginator = CursorPaginator(comments.select_related('author'),
+                                NUMBER_OF_COMMENTS,
+                                ordering=COMMENTS_ORDERING)
+    return paginator.get_page(request.GET.get('cursor'))
@@ -0,0 +1,137 @@
+"""Версии кешируемых лент.
+
+Ключ каждого кешируемого фрагмента включает версию ленты. Сигналы
+Post, Comment и Follow меняют версии только затронутых лент, поэтому
+фрагменты живут долго и не перестраиваются все разом.
+
+Имена лент: 'index', 'group:<id>', 'profile:<id>', 'follow:<id>',
+'post:<id>'. Версия 'all' входит в каждый ключ и сбрасывает всё сразу.
+Карточки постов в лентах кешируются отдельно и зависят от версий
+'author:<id>' (имя автора), 'group-info:<id>' (slug группы) и
+'post-card:<id>' (готовность миниатюр). Ленты и страницы постов
+кешируются вместе с карточками, поэтому при смене имени автора или
+slug группы сбрасываются и они (author_feeds).
+Версия начинается с времени её создания, поэтому по ней же
+вычисляется Last-Modified ленты.
+"""
+import datetime as dt
+import time
+import uuid
+
+from django.core.cache import cache
+
+from .models import Comment, Follow, Post
+
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 6
+VERSION_PREFIX: str = 'feed-version'
+ALL: str = 'all'
+
+
+def _key(name):
+    return f'{VERSION_PREFIX}:{name}'
+
+
+def _new_token():
+    return f'{int(time.time() * 1000):x}-{uuid.uuid4().hex[:8]}'
+
+
+def _created(token):
+    """Время создания версии в миллисекундах, 0 для версий старого
+    формата."""
+    prefix, separator, _ = token.partition('-')
+    return int(prefix, 16) if separator else 0
+
+
+def _fetch(names):
+    keys = {_key(name): name for name in names}
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = _new_token()
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            versions[key] = token
+    return {name: versions[key] for key, name in keys.items()}
+
+
+def _tokens(names):
+    versions = _fetch((ALL, *names))
+    return [versions[name] for name in (ALL, *names)]
+
+
+def get_versions(names):
+    """Версии многих лент одним обращением к кешу: словарь
+    имя -> версия, в каждую входит версия 'all'."""
+    versions = _fetch((ALL, *names))
+    return {name: f'{versions[ALL]}.{versions[name]}' for name in names}
+
+
+def get_version(*names):
+    """Возвращает общую версию для набора лент."""
+    return '.'.join(_tokens(names))
+
+
+def get_version_and_changed(*names):
+    """Общая версия набора лент и время последнего изменения
+    любой из них."""
+    tokens = _tokens(names)
+    milliseconds = max(_created(token) for token in tokens)
+    changed = dt.datetime.fromtimestamp(milliseconds / 1000, dt.timezone.utc)
+    return '.'.join(tokens), changed
+
+
+def bump(*names):
+    """Сбрасывает кеш перечисленных лент."""
+    if names:
+        cache.set_many({_key(name): _new_token() for name in names}, None)
+
+
+def bump_all():
+    bump(ALL)
+
+
+def post_feeds(post):
+    """Ленты, в которых показывается пост, кроме лент подписок:
+    их столько, сколько у автора подписчиков, поэтому их сбрасывают
+    фоновые задачи (см. follower_feeds)."""
+    feeds = {'index', f'post:{post.pk}', f'profile:{post.author_id}'}
+    initial_group_id = getattr(post, '_initial_group_id', None)
+    for group_id in (post.group_id, initial_group_id):
+        if group_id is not None:
+            feeds.add(f'group:{group_id}')
+    return feeds
+
+
+def follower_feeds(author_id):
+    """Ленты подписок подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    return [f'follow:{user_id}' for user_id in followers.iterator()]
+
+
+def author_feeds(author_id):
+    """Ленты и страницы постов, где есть карточки или комментарии
+    автора."""
+    posts = Post.objects.filter(author_id=author_id)
+    feeds = {'index', f'profile:{author_id}'}
+    feeds.update(
+        f'group:{group_id}' for group_id in posts.exclude(
+            group=None).order_by().values_list('group_id',
+                                               flat=True).distinct())
+    feeds.update(f'post:{post_id}' for post_id in posts.values_list(
+        'pk', flat=True).iterator())
+    feeds.update(
+        f'post:{post_id}' for post_id in Comment.objects.filter(
+            author_id=author_id).order_by().values_list(
+                'post_id', flat=True).distinct())
+    feeds.update(follower_feeds(author_id))
+    return feeds
+
+
+def feed_cache_context(*names):
+    """Переменные контекста для {% cache %} в шаблонах лент."""
+    return {
+        'cache_version': get_version(*names),
+        'cache_timeout': FEED_CACHE_TIMEOUT,
+    }
@@ -1,60 +1,130 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db.models import Max
+
+from core.page_cache import skeleton_cache
 
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
+from .conditional import conditional_page
+from .counters import get_author_stats
 from .forms import PostForm, CommentForm
-from .utils import pagination_on_page
+from .search import SearchResults
+from .timeline import TimelinePaginator, timeline_posts
+from .utils import NUMBER_OF_POSTS, comments_page, pagination_on_page
+from .versions import feed_cache_context, get_version
+from . import write_queue
+
+
+def group_version(request, slug):
+    # Группа нужна и представлению, второй раз её не запрашиваем.
+    request.group = Group.objects.filter(slug=slug).first()
+    if request.group is None:
+        return None
+    return get_version(f'group:{request.group.pk}')
 
 
+def page_version(request, *args, **kwargs):
+    """Версия, посчитанная conditional_page."""
+    return getattr(request, 'page_version', None)
+
+
+@skeleton_cache(lambda request: get_version('index'))
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.feed()
     page_obj = pagination_on_page(request, post_list)
     context = {
         'page_obj': page_obj,
+        **feed_cache_context('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@skeleton_cache(group_version)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = (getattr(request, 'group', None)
+             or get_object_or_404(Group, slug=slug))
+    post_list = group.posts.feed()
     page_obj = pagination_on_page(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache_context(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def profile_state(request, username):
+    rows = User.objects.filter(username=username).values('pk').annotate(
+        last_post=Max('posts__pub_date')).values_list(
+            'pk', 'last_post').order_by()[:1]
+    if not rows:
+        return None
+    author_id, last_post = rows[0]
+    return [f'profile:{author_id}'], last_post
+
+
+@conditional_page(profile_state)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
     following = request.user.is_authenticated and author.following.filter(
         user=request.user).exists()
-    post_list = author.posts.all()
+    post_list = author.posts.feed()
     page_obj = pagination_on_page(request, post_list)
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following
+        'author_stats': get_author_stats(author),
+        'following': following,
+        **feed_cache_context(f'profile:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_detail_state(request, post_id):
+    rows = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date').annotate(
+            last_comment=Max('comments__created')).values_list(
+                'author_id', 'pub_date', 'last_comment').order_by()[:1]
+    if not rows:
+        return None
+    author_id, pub_date, last_comment = rows[0]
+    # На странице поста есть счётчики автора из его профиля.
+    return ([f'post:{post_id}', f'profile:{author_id}'],
+            max(filter(None, (pub_date, last_comment))))
+
+
+@conditional_page(post_detail_state)
+@skeleton_cache(page_version)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.detail(), pk=post_id)
     form = CommentForm()
-    author = User.objects.get(username=post.author)
     context = {
         'post': post,
-        'author': author,
-        'comments': comments,
+        'author': post.author,
+        'author_stats': get_author_stats(post.author),
+        'comments': comments_page(request, post.comments),
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@skeleton_cache(lambda request, post_id: get_version(f'post:{post_id}'))
+def post_comments(request, post_id):
+    """Следующая страница комментариев для подгрузки на странице поста.
+    Пост не запрашивается: для несуществующего список пуст."""
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(
+            request, Comment.objects.filter(post_id=post_id)),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -85,7 +155,10 @@ def post_edit(request, post_id):
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.WRITE_BEHIND_ENABLED:
+        write_queue.enqueue_comment(post.pk, request.user.pk,
+                                    form.cleaned_data['text'])
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -95,11 +168,13 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related(
-        'author', 'group').filter(author__following__user=request.user)
-    page_obj = pagination_on_page(request, post_list)
+    post_list = timeline_posts(request.user).feed()
+    page_obj = pagination_on_page(
+        request, post_list,
+        cursor_paginator=TimelinePaginator(request.user, NUMBER_OF_POSTS))
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **feed_cache_context(f'follow:{request.user.pk}'),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -107,7 +182,9 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if author != request.user:
+    if author != request.user and settings.WRITE_BEHIND_ENABLED:
+        write_queue.enqueue_follow(request.user.pk, author.pk)
+    elif author != request.user:
         Follow.objects.get_or_create(
             user=request.user,
             author=author
@@ -121,3 +198,17 @@ def profile_unfollow(request, username):
     if author != request.user:
         Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', author)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(SearchResults(query), NUMBER_OF_POSTS)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,252 @@
+"""Отложенная пакетная запись комментариев и подписок.
+
+При WRITE_BEHIND_ENABLED add_comment и profile_follow не пишут в базу
+сами, а ставят запись в очередь. Запись сначала дописывается в журнал
+WRITE_BEHIND_JOURNAL с fsync, поэтому ответ означает, что она не
+потеряется. Фоновый поток не реже раза в WRITE_BEHIND_FLUSH_INTERVAL
+секунд записывает накопленное одним bulk_create в одной транзакции:
+под SQLite это одна блокировка записи вместо блокировки на каждую
+строку. После записи вручную отправляются сигналы post_save, чтобы
+счётчики, ленты и кеш обновились как при обычном save().
+
+У каждого процесса свой журнал '<WRITE_BEHIND_JOURNAL>.<pid>': процесс
+переписывает только его, поэтому не теряет записи соседей. Журналы
+завершившихся процессов при старте забирает себе первый новый процесс
+(adopt_orphans), так что каждая строка повторяется один раз.
+Доставка «хотя бы один раз»: если процесс упадёт между коммитом и
+очисткой журнала, комментарий может записаться дважды, подписки
+защищены уникальностью.
+"""
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import (DEFAULT_DB_ALIAS, IntegrityError,
+                       close_old_connections, transaction)
+from django.db.models.signals import post_save
+
+from .models import Comment, Follow, Post, User
+
+logger = logging.getLogger(__name__)
+
+ADOPTING_SUFFIX: str = '.adopting'
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class WriteQueue:
+    def __init__(self, journal, flush_interval, batch_size, autostart=True):
+        self.journal = journal
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.autostart = autostart
+        self.pid = os.getpid()
+        self._pending = self._replay()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def _replay(self):
+        if not os.path.exists(self.journal):
+            return []
+        with open(self.journal, encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def _append(self, record):
+        with open(self.journal, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _rewrite_journal(self):
+        directory = os.path.dirname(os.path.abspath(self.journal))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with open(fd, 'w', encoding='utf-8') as file:
+            for record in self._pending:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.journal)
+
+    def enqueue(self, record):
+        """Сохраняет запись в журнал и ставит в очередь."""
+        with self._condition:
+            self._append(record)
+            self._pending.append(record)
+            self._condition.notify()
+        if self.autostart:
+            self.start()
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='write-behind',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать очередь')
+                time.sleep(self.flush_interval)
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Записывает накопленное в базу. Возвращает число записей."""
+        with self._flush_lock:
+            with self._condition:
+                batch = self._pending[:self.batch_size]
+            if not batch:
+                return 0
+            try:
+                _write(batch)
+            except IntegrityError:
+                # Одна битая запись не должна держать всю очередь:
+                # пишем по одной и отбрасываем те, что не записываются.
+                logger.exception('Пакет не записан, пишем по одной')
+                for record in batch:
+                    try:
+                        _write([record])
+                    except IntegrityError:
+                        logger.exception('Запись отброшена: %s', record)
+            with self._condition:
+                del self._pending[:len(batch)]
+                self._rewrite_journal()
+            return len(batch)
+
+    def __len__(self):
+        return len(self._pending)
+
+
+def _write(batch):
+    comments = [record for record in batch if record['model'] == 'comment']
+    follows = [record for record in batch if record['model'] == 'follow']
+    existing_posts = set(Post.objects.filter(
+        pk__in={record['post_id'] for record in comments}
+    ).values_list('pk', flat=True))
+    # Пользователь мог быть удалён, пока запись ждала в очереди.
+    existing_users = set(User.objects.filter(
+        pk__in={record['author_id'] for record in comments + follows}
+        | {record['user_id'] for record in follows}
+    ).values_list('pk', flat=True))
+    comments = [
+        Comment(post_id=record['post_id'],
+                author_id=record['author_id'],
+                text=record['text'])
+        for record in comments
+        if record['post_id'] in existing_posts
+        and record['author_id'] in existing_users
+    ]
+    pairs = {
+        (record['user_id'], record['author_id'])
+        for record in follows
+        if record['user_id'] != record['author_id']
+        and record['user_id'] in existing_users
+        and record['author_id'] in existing_users
+    }
+    with transaction.atomic():
+        if pairs:
+            pairs -= set(Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs},
+                author_id__in={author_id for _, author_id in pairs},
+            ).values_list('user_id', 'author_id'))
+        follows = [Follow(user_id=user_id, author_id=author_id)
+                   for user_id, author_id in pairs]
+        Comment.objects.bulk_create(comments)
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        # bulk_create не отправляет post_save, а от него зависят
+        # счётчики, ленты и версии кеша.
+        for instance in comments + follows:
+            post_save.send(sender=type(instance),
+                           instance=instance,
+                           created=True,
+                           raw=False,
+                           using=DEFAULT_DB_ALIAS,
+                           update_fields=None)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _journal_pid(base, path):
+    suffix = path[len(base) + 1:]
+    if suffix.endswith(ADOPTING_SUFFIX):
+        suffix = suffix[:-len(ADOPTING_SUFFIX)]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def adopt_orphans(base, journal, is_alive=_pid_alive):
+    """Дописывает в journal журналы завершившихся процессов.
+
+    Журнал сначала переименовывается: rename атомарен, поэтому
+    один и тот же журнал заберёт только один процесс."""
+    for path in sorted(glob.glob(glob.escape(base) + '.*')):
+        pid = _journal_pid(base, path)
+        if path == journal or pid is None or is_alive(pid):
+            continue
+        claimed = journal + ADOPTING_SUFFIX
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+        with open(claimed, encoding='utf-8') as source, \
+                open(journal, 'a', encoding='utf-8') as target:
+            target.write(source.read())
+            target.flush()
+            os.fsync(target.fileno())
+        os.remove(claimed)
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        # После fork у процесса должен быть свой журнал.
+        if _queue is None or _queue.pid != os.getpid():
+            base = settings.WRITE_BEHIND_JOURNAL
+            journal = f'{base}.{os.getpid()}'
+            adopt_orphans(base, journal)
+            _queue = WriteQueue(journal,
+                                settings.WRITE_BEHIND_FLUSH_INTERVAL,
+                                settings.WRITE_BEHIND_BATCH_SIZE)
+            if len(_queue):
+                _queue.start()
+        return _queue
+
+
+def enqueue_comment(post_id, author_id, text):
+    get_queue().enqueue({'model': 'comment',
+                         'post_id': post_id,
+                         'author_id': author_id,
+                         'text': text})
+
+
+def enqueue_follow(user_id, author_id):
+    get_queue().enqueue({'model': 'follow',
+                         'user_id': user_id,
+                         'author_id': author_id})
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class TasksConfig(AppConfig):
+    name = 'tasks'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        from . import checks  # noqa: F401
+
+        # Задачи регистрируются при импорте модулей tasks приложений.
+        autodiscover_modules('tasks')
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Воркер сбрасывает версии лент в своём кеше, веб-процессы
+    увидят это, только если кеш у них общий."""
+    if settings.TASKS_ALWAYS_EAGER:
+        return []
+    if isinstance(caches['default'], LocMemCache):
+        return [Error(
+            'Фоновые задачи выполняет отдельный воркер, а кеш locmem '
+            'у каждого процесса свой: сброс кеша лент в задачах '
+            'не дойдёт до веб-процессов.',
+            hint='Укажите CACHE_BACKEND=file или CACHE_BACKEND=redis.',
+            id='tasks.E001',
+        )]
+    return []
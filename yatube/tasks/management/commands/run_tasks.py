@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tasks import queue
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.TASKS_BATCH_SIZE)
+        parser.add_argument('--interval', type=float,
+                            default=settings.TASKS_POLL_INTERVAL,
+                            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--stats', action='store_true',
+                            help='Вывести метрики очереди в JSON и выйти')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(queue.snapshot(),
+                                         ensure_ascii=False))
+            return
+        try:
+            while True:
+                taken = queue.run_pending(options['batch_size'])
+                if options['once'] and not taken:
+                    break
+                if not taken:
+                    queue.purge()
+                    close_old_connections()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stderr.write(json.dumps(queue.snapshot()['executed'],
+                                     ensure_ascii=False))
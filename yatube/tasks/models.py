@@ -0,0 +1,56 @@
+import json
+
+from django.db import models
+from django.utils import timezone
+
+from core.models import CreatedModel
+
+
+class Task(CreatedModel):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.TextField('Аргументы', default='[]')
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text='Задача с тем же ключом ставится в очередь один раз'
+    )
+    status = models.CharField('Статус',
+                              max_length=10,
+                              choices=STATUS_CHOICES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField('Попытки', default=0)
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    locked_at = models.DateTimeField('Взята в работу', null=True,
+                                     blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        ordering = ('run_after', 'id')
+        # Выборка воркера: готовые к запуску задачи по очереди.
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'],
+                         name='task_status_run_after_idx'),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
+
+    @property
+    def args(self):
+        return json.loads(self.payload)
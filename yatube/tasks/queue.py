@@ -0,0 +1,220 @@
+"""Фоновые задачи с очередью в базе данных.
+
+Функция-задача регистрируется декоратором @task под именем
+'<модуль>.<функция>', enqueue() ставит её в очередь строкой Task в той
+же транзакции, что и изменение данных: воркер увидит задачу только
+после коммита. Воркер (manage.py run_tasks) берёт готовые задачи,
+при ошибке повторяет их с экспоненциальной задержкой и пишет
+метрики в лог yatube.tasks.
+
+При TASKS_ALWAYS_EAGER задачи выполняются сразу в текущем процессе,
+а задачи с after_commit=True — после коммита транзакции.
+
+Задачи выполняются «хотя бы один раз» и должны быть идемпотентными.
+"""
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger('yatube.tasks')
+
+ERROR_MAX_LENGTH: int = 5000
+
+_registry = {}
+_lock = threading.Lock()
+_stats = {}
+
+
+class TaskFunction:
+    def __init__(self, function, name, max_attempts, after_commit):
+        self.function = function
+        self.name = name
+        self.max_attempts = max_attempts
+        self.after_commit = after_commit
+
+    def __call__(self, *args):
+        return self.function(*args)
+
+    def delay(self, *args, key=None, countdown=0):
+        return enqueue(self.name, *args, key=key, countdown=countdown)
+
+
+def task(function=None, *, name=None, max_attempts=None,
+         after_commit=False):
+    """Регистрирует функцию как фоновую задачу."""
+    def decorator(function):
+        task_name = name or f'{function.__module__}.{function.__name__}'
+        registered = TaskFunction(function, task_name, max_attempts,
+                                  after_commit)
+        _registry[task_name] = registered
+        return registered
+    return decorator(function) if function else decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'Задача {name} не зарегистрирована')
+
+
+def enqueue(name, *args, key=None, countdown=0):
+    """Ставит задачу в очередь.
+
+    Задача с уже известным ключом key повторно не ставится.
+    Аргументы должны сериализоваться в JSON."""
+    registered = get_task(name)
+    payload = json.dumps(args)
+    if settings.TASKS_ALWAYS_EAGER:
+        args = json.loads(payload)
+        if registered.after_commit:
+            transaction.on_commit(lambda: execute(registered, args))
+        else:
+            execute(registered, args)
+        return
+    Task.objects.bulk_create([Task(
+        name=name,
+        payload=payload,
+        idempotency_key=key,
+        run_after=timezone.now() + timedelta(seconds=countdown),
+    )], ignore_conflicts=True)
+
+
+def execute(registered, args):
+    started = time.perf_counter()
+    status = 'done'
+    try:
+        return registered(*args)
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        record(registered.name, status, time.perf_counter() - started)
+
+
+def record(name, status, duration):
+    with _lock:
+        stats = _stats.setdefault(name, {
+            'done': 0,
+            'error': 0,
+            'duration_ms': 0.0,
+        })
+        stats[status] += 1
+        stats['duration_ms'] += duration * 1000
+    logger.info(json.dumps({'task': name,
+                            'status': status,
+                            'duration_ms': round(duration * 1000, 3)}))
+
+
+def snapshot():
+    """Метрики выполнения задач в этом процессе и состояние очереди."""
+    with _lock:
+        executed = {
+            name: {
+                'done': stats['done'],
+                'error': stats['error'],
+                'duration_ms_avg': round(
+                    stats['duration_ms']
+                    / (stats['done'] + stats['error']), 3),
+            }
+            for name, stats in _stats.items()
+        }
+    oldest = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=timezone.now()
+    ).aggregate(oldest=Min('run_after'))['oldest']
+    return {
+        'executed': executed,
+        'queue': dict(Task.objects.order_by().values_list(
+            'status').annotate(Count('id'))),
+        'lag_seconds': (round((timezone.now() - oldest).total_seconds(), 3)
+                        if oldest else 0),
+    }
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def retry_delay(attempts):
+    return min(settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.TASKS_RETRY_MAX_DELAY)
+
+
+def claim(limit):
+    """Берёт в работу до limit готовых задач.
+
+    Задача переводится в running условным UPDATE, поэтому несколько
+    воркеров не возьмут одну задачу дважды и без SELECT FOR UPDATE."""
+    now = timezone.now()
+    # Задачи упавшего воркера возвращаются в очередь.
+    Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+    ).update(status=Task.PENDING)
+    candidates = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=now
+    ).values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+                status=Task.RUNNING,
+                locked_at=now,
+                attempts=F('attempts') + 1):
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed))
+
+
+def run(queued):
+    """Выполняет взятую задачу и записывает результат."""
+    registered = _registry.get(queued.name)
+    try:
+        with transaction.atomic():
+            execute(get_task(queued.name), queued.args)
+    except Exception:
+        max_attempts = (registered and registered.max_attempts
+                        or settings.TASKS_MAX_ATTEMPTS)
+        queued.last_error = traceback.format_exc()[-ERROR_MAX_LENGTH:]
+        if queued.attempts >= max_attempts:
+            queued.status = Task.FAILED
+            logger.error('Задача %s (%s) не выполнена после %s попыток',
+                         queued.pk, queued.name, queued.attempts)
+        else:
+            queued.status = Task.PENDING
+            queued.run_after = timezone.now() + timedelta(
+                seconds=retry_delay(queued.attempts))
+        queued.locked_at = None
+        queued.save(update_fields=['status', 'run_after', 'locked_at',
+                                   'last_error'])
+        return False
+    queued.status = Task.DONE
+    queued.locked_at = None
+    queued.save(update_fields=['status', 'locked_at'])
+    return True
+
+
+def run_pending(limit):
+    """Выполняет готовые задачи. Возвращает число взятых задач."""
+    queued = claim(limit)
+    for item in queued:
+        run(item)
+    return len(queued)
+
+
+def purge():
+    """Удаляет выполненные задачи старше TASKS_RETENTION_DAYS."""
+    return Task.objects.filter(
+        status=Task.DONE,
+        run_after__lt=timezone.now() - timedelta(
+            days=settings.TASKS_RETENTION_DAYS),
+    ).delete()[0]
@@ -0,0 +1,141 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.versions import get_version
+
+from . import checks, queue
+from .models import Task
+
+User = get_user_model()
+
+calls = []
+
+
+@queue.task(name='tests.remember')
+def remember(value):
+    calls.append(value)
+
+
+@queue.task(name='tests.fail', max_attempts=2)
+def fail():
+    raise ValueError('Ошибка задачи')
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        queue.reset()
+
+    def test_enqueue_and_run(self):
+        """Проверяем, что задача ставится в очередь и выполняется
+        воркером."""
+        remember.delay(1)
+        self.assertEqual(calls, [], 'Задача выполнена при постановке')
+        self.assertEqual(queue.run_pending(10), 1)
+        self.assertEqual(calls, [1])
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(queue.run_pending(10), 0,
+                         'Выполненная задача взята повторно')
+
+    def test_idempotency_key(self):
+        """Проверяем, что задача с тем же ключом ставится один раз."""
+        remember.delay(1, key='once')
+        remember.delay(2, key='once')
+        queue.run_pending(10)
+        self.assertEqual(calls, [1])
+
+    def test_countdown(self):
+        """Проверяем, что отложенная задача не берётся раньше срока."""
+        remember.delay(1, countdown=60)
+        self.assertEqual(queue.run_pending(10), 0)
+
+    def test_retry_with_backoff_then_fail(self):
+        """Проверяем повтор с задержкой и перевод в failed после
+        исчерпания попыток."""
+        fail.delay()
+        queue.run_pending(10)
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertIn('Ошибка задачи', task.last_error)
+        self.assertGreater(task.run_after, timezone.now(),
+                           'Повтор не отложен')
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('yatube.tasks', 'ERROR'):
+            queue.run_pending(10)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(queue.snapshot()['executed']['tests.fail']['error'],
+                         2, 'Ошибки не попали в метрики')
+
+    def test_stale_running_task_is_reclaimed(self):
+        """Проверяем, что задача упавшего воркера возвращается
+        в очередь."""
+        Task.objects.create(name='tests.remember',
+                            payload='[3]',
+                            status=Task.RUNNING,
+                            locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(queue.run_pending(10), 1)
+        self.assertEqual(calls, [3])
+
+    def test_signals_enqueue_side_effects(self):
+        """Проверяем, что сигналы постов ставят рассылку по лентам
+        в очередь, а не выполняют её в запросе."""
+        author = User.objects.create_user(username='test_author')
+        follower = User.objects.create_user(username='test_follower')
+        Follow.objects.create(user=follower, author=author)
+        post = Post.objects.create(text='Пост', author=author)
+        self.assertFalse(TimelineEntry.objects.exists(),
+                         'Рассылка выполнена синхронно')
+        self.assertTrue(Task.objects.filter(
+            name='posts.tasks.push_post',
+            idempotency_key=f'push_post:{post.pk}').exists())
+        out = StringIO()
+        call_command('run_tasks', '--once', stderr=out)
+        self.assertTrue(TimelineEntry.objects.filter(user=follower,
+                                                     post=post).exists())
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+    def test_post_edit_bumps_follower_feeds_in_task(self):
+        """Проверяем, что правка поста сбрасывает ленты подписчиков
+        в фоновой задаче, без перебора подписчиков в запросе."""
+        author = User.objects.create_user(username='test_author')
+        follower = User.objects.create_user(username='test_follower')
+        Follow.objects.create(user=follower, author=author)
+        post = Post.objects.create(text='Пост', author=author)
+        call_command('run_tasks', '--once', stderr=StringIO())
+        version = get_version(f'follow:{follower.pk}')
+        post.text = 'Исправленный пост'
+        with self.assertNumQueries(3):
+            # обновление поста, задачи поиска и сброса лент
+            post.save()
+        self.assertEqual(get_version(f'follow:{follower.pk}'), version,
+                         'Лента подписчика сброшена синхронно')
+        call_command('run_tasks', '--once', stderr=StringIO())
+        self.assertNotEqual(get_version(f'follow:{follower.pk}'), version,
+                            'Лента подписчика не сброшена задачей')
+
+    def test_worker_requires_shared_cache(self):
+        """Проверяем, что воркер с кешем locmem не проходит проверку
+        при запуске."""
+        errors = checks.check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['tasks.E001'])
+        with override_settings(TASKS_ALWAYS_EAGER=True):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager(self):
+        """Проверяем, что в режиме TASKS_ALWAYS_EAGER задача
+        выполняется сразу и не сохраняется."""
+        remember.delay(5)
+        self.assertEqual(calls, [5])
+        self.assertFalse(Task.objects.exists())
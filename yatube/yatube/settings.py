@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'tasks.apps.TasksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -51,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,10 +69,15 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('core.template_loaders.ProfilingLoader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -81,6 +89,14 @@ TEMPLATES = [
     },
 ]
 
+# Шаблоны приложений ищет app_directories.Loader внутри ProfilingLoader,
+# а debug_toolbar проверяет только APP_DIRS.
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
+# Шаблоны, которые компилируются при старте процесса. Имеет смысл
+# только с django.template.loaders.cached.Loader (см. settings_prod).
+TEMPLATES_PRELOAD = []
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 # Database
@@ -93,6 +109,50 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite: WAL позволяет читать
+# во время записи, synchronous=NORMAL в режиме WAL не теряет
+# целостность, mmap_size в байтах, cache_size в КиБ со знаком минус.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+# Реплики для чтения: псевдонимы из DATABASES. Пока их нет, всё читается
+# из default.
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_APPS = ['posts']
+REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:api_index',
+    'posts:api_group_list',
+    'posts:api_profile',
+    'posts:api_post_detail',
+    'posts:api_follow_index',
+    'about:author',
+    'about:tech',
+]
+# После этих представлений пользователь какое-то время читает из default
+# и видит свои изменения, даже если реплика отстаёт.
+PRIMARY_AFTER_VIEWS = [
+    'posts:post_create',
+    'posts:post_edit',
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+]
+READ_YOUR_WRITES_SECONDS = 10
+
+# Как часто проверять постоянные соединения (CONN_MAX_AGE) перед запросом.
+DB_HEALTH_CHECK_INTERVAL = 30
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -142,10 +202,118 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# locmem - свой кеш в каждом процессе, file - общий кеш процессов
+# одного сервера, redis - общий кеш всех серверов (нужен django-redis).
+# Кеш страниц сбрасывается только в процессе, который изменил данные,
+# поэтому при нескольких процессах нужен file или redis (settings_prod).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'core.cache_backends.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'core.cache_backends.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION',
+                              os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'redis': {
+        'BACKEND': 'core.cache_backends.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        },
+    },
+}
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+# Ленты подписок: авторы с таким числом подписчиков и больше
+# не раскладываются по лентам, а подмешиваются при чтении.
+TIMELINE_CELEBRITY_THRESHOLD = 1000
+TIMELINE_BACKFILL_SIZE = 100
+
+# Миниатюры картинок постов создаются в фоне сразу после загрузки:
+# по одной на каждую ширину в формате по умолчанию и в каждом
+# современном формате, который поддерживает Pillow. Высота вписывается
+# в пропорции POST_IMAGE_BOX.
+THUMBNAIL_WORKERS = 2
+POST_IMAGE_WIDTHS = [320, 640, 960]
+POST_IMAGE_BOX = (960, 339)
+POST_IMAGE_FORMATS = ['AVIF', 'WEBP']
+POST_IMAGE_SIZES = '(max-width: 576px) 100vw, 960px'
+
+# Ограничения и пересжатие картинок при загрузке (posts.images).
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_QUALITY = 85
+# Загрузка больше POST_IMAGE_MAX_BYTES обрывается, не дожидаясь конца
+# файла.
+FILE_UPLOAD_HANDLERS = [
+    'posts.images.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Конфигурация полнотекстового поиска PostgreSQL.
+SEARCH_CONFIG = 'russian'
+
+# Сколько секунд обратный прокси может отдавать гостям страницу поста
+# и профиля без перепроверки.
+PROXY_CACHE_MAX_AGE = 10
+
+# Фоновые задачи (приложение tasks). В разработке и тестах выполняются
+# сразу, в production — воркером manage.py run_tasks.
+TASKS_ALWAYS_EAGER = True
+TASKS_MAX_ATTEMPTS = 5
+# Задержка перед повтором в секундах, удваивается с каждой попыткой.
+TASKS_RETRY_DELAY = 10
+TASKS_RETRY_MAX_DELAY = 60 * 60
+# Через сколько секунд задача упавшего воркера возвращается в очередь.
+TASKS_LOCK_TIMEOUT = 5 * 60
+TASKS_BATCH_SIZE = 20
+TASKS_POLL_INTERVAL = 1.0
+TASKS_RETENTION_DAYS = 7
+
+# Отложенная пакетная запись комментариев и подписок (posts.write_queue).
+# Запись подтверждается после fsync журнала и попадает в базу не позже
+# чем через WRITE_BEHIND_FLUSH_INTERVAL секунд.
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', '') == '1'
+WRITE_BEHIND_FLUSH_INTERVAL = 0.05
+WRITE_BEHIND_BATCH_SIZE = 500
+WRITE_BEHIND_JOURNAL = os.path.join(BASE_DIR, 'write_queue.ndjson')
+
+# Доля запросов, для которых собираются метрики (от 0 до 1).
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))
+# /metrics/ открыт сотрудникам (is_staff) и сборщику метрик с заголовком
+# «Authorization: Bearer <METRICS_TOKEN>». Пустой токен такой доступ
+# выключает.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        'yatube.tasks': {
+            'handlers': ['console'],
+            'level': os.getenv('TASKS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
 
 INTERNAL_IPS = [
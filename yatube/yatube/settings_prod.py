@@ -0,0 +1,99 @@
+"""Настройки для production: DJANGO_SETTINGS_MODULE=yatube.settings_prod.
+
+Соединения с базой постоянные. Для PostgreSQL (DB_ENGINE=postgresql)
+используется бэкенд с пулом соединений core.db_backends.postgresql_pool.
+Шаблоны компилируются один раз на процесс загрузчиком cached.Loader
+внутри ProfilingLoader, шаблоны лент — сразу при старте
+(TEMPLATES_PRELOAD).
+Кеш по умолчанию файловый: версии лент сбрасывает процесс, который
+изменил данные, и остальные процессы должны видеть это в общем кеше.
+С locmem каждый процесс отдавал бы свои копии страниц часами.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, CACHE_BACKENDS, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ['SECRET_KEY']
+
+# Только общий для всех процессов кеш: file или redis.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('core.template_loaders.ProfilingLoader', [
+                ('django.template.loaders.cached.Loader',
+                 TEMPLATES[0]['OPTIONS']['loaders'][0][1]),
+            ]),
+        ],
+    },
+}]
+TEMPLATES_PRELOAD = [
+    'posts/index.html',
+    'posts/group_list.html',
+    'posts/profile.html',
+    'posts/follow.html',
+    'posts/post_detail.html',
+    'posts/includes/post_card.html',
+    'posts/includes/post_image.html',
+]
+
+# Побочные эффекты сигналов выполняет воркер manage.py run_tasks.
+TASKS_ALWAYS_EAGER = False
+
+ALLOWED_HOSTS = os.getenv(
+    'ALLOWED_HOSTS',
+    'IgorKrupko.pythonanywhere.com,www.IgorKrupko.pythonanywhere.com'
+).split(',')
+
+if os.getenv('DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.db_backends.postgresql_pool',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Закрытое соединение возвращается в пул.
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MAX_SIZE': int(os.getenv('DB_POOL_SIZE', '10')),
+                'TIMEOUT': 5,
+                'MAX_LIFETIME': 30 * 60,
+                'CHECK_INTERVAL': 30,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME',
+                              os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            'OPTIONS': {
+                'timeout': 20,
+            },
+        }
+    }
+
+# Реплики PostgreSQL: DB_REPLICA_HOSTS=host1,host2.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)